@@ -1,30 +1,196 @@
 # ai_generator.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing import Annotated, Literal
 import requests
 import json
+import logging
+import os
 import re
 import random
+import threading
+import time
 
-app = FastAPI()
+from ai_telemetry import logger, telemetry
+
+logging.basicConfig(level=os.environ.get("AI_LOG_LEVEL", "INFO"))
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background so the service accepts requests right away
+    if os.environ.get("AI_WARM_UP", "1") == "1":
+        threading.Thread(target=warm_up, name="ollama-warm-up", daemon=True).start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # Configuration
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_NAME = "qwen2.5:3b" # Update this to your specific model name
 
+# ===== MODEL ROUTING =====
+# Every endpoint tries its tiers in order. A tier that misses its timeout (or
+# can't produce a valid answer) hands over to the next, faster one, as long
+# as the endpoint's budget lasts. Keep the budgets below the per-attempt
+# timeouts in AI_SERVICE_ENDPOINTS (core/settings.py).
+TIERS = {
+    "fast": {"model": os.environ.get("AI_FAST_MODEL", "qwen2.5:0.5b"), "timeout": 20},
+    "quality": {"model": os.environ.get("AI_QUALITY_MODEL", MODEL_NAME), "timeout": 35},
+}
+
+ROUTES = {
+    "generate_enemy": ["fast"],
+    "generate_quests": ["quality", "fast"],
+    "generate_quest_enemies": ["fast"],
+    "generate_shop_items": ["quality", "fast"],
+}
+
+BUDGETS = {
+    "generate_enemy": 25,
+    "generate_quests": 55,
+    "generate_quest_enemies": 55,
+    "generate_shop_items": 55,
+}
+
+# Keep the model loaded between requests instead of Ollama's 5 minute default
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
 class EnemyRequest(BaseModel):
     player_level: int
     environment: str
 
-def clean_json(text):
-    """Helper to extract JSON from the AI's chatty response"""
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        return match.group(0)
-    return "{}"
+# ===== OUTPUT SCHEMAS =====
+# The shapes the Django side stores (game/models.py Enemy, Quest and Item).
+# They go to Ollama as the "format" of every request, so the model can only
+# produce matching JSON, and every answer is validated against them again.
+class EnemyOut(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    level: int = Field(ge=1)
+    health: float = Field(gt=0)
+    attack_power: float = Field(ge=0)
+    xp_reward: float = Field(ge=0)
 
-@app.post("/generate-enemy/")
-def generate_enemy(req: dict):
+class QuestEnemyOut(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    health: float = Field(gt=0)
+    attack_power: float = Field(ge=0)
+    xp_reward: float = Field(ge=0)
+
+class QuestOut(BaseModel):
+    title: str = Field(min_length=1, max_length=100)
+    description: str = Field(min_length=1)
+    xp_reward: int = Field(ge=0)
+
+class ShopItemOut(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    item_type: Literal['HEAD', 'CHEST', 'FEET', 'GLOVES', 'RING', 'AMULET', 'WEAPON']
+    health_bonus: int = Field(ge=0)
+    power_bonus: int = Field(ge=0)
+    price: int = Field(ge=0)
+
+def list_of(model, count=3):
+    """Ask for exactly `count` records (schema inlined), accept any non-empty list"""
+    return TypeAdapter(Annotated[list[model], Field(min_length=1)]), {
+        "type": "array",
+        "items": model.model_json_schema(),
+        "minItems": count,
+        "maxItems": count,
+    }
+
+# endpoint -> (validator, JSON schema sent to Ollama)
+SCHEMAS = {
+    "generate_enemy": (TypeAdapter(EnemyOut), EnemyOut.model_json_schema()),
+    "generate_quests": list_of(QuestOut),
+    "generate_quest_enemies": list_of(QuestEnemyOut),
+    "generate_shop_items": list_of(ShopItemOut),
+}
+
+# Generations per request before giving up on a valid answer
+MAX_ATTEMPTS = 2
+
+# Keys the model likes to use instead of the real ones
+KEY_ALIASES = {
+    'price(10g)': 'price',
+    'type': 'item_type',
+    'attack': 'attack_power',
+    'hp': 'health',
+    'xp': 'xp_reward',
+}
+
+# ===== PROMPTS =====
+# Ollama reuses the KV cache for the longest prompt prefix it has already
+# seen, so every prompt starts with a long static block per endpoint and only
+# the last few lines change between requests. Don't put request data into the
+# prefixes.
+ENEMY_PREFIX = (
+    "You are the Game Master of a fantasy RPG. You create a single enemy for the hero to fight.\n"
+    "Rules:\n"
+    "- Answer with ONE JSON object and nothing else: no markdown, no comments, no explanation.\n"
+    "- The object has exactly these keys: \"name\", \"level\", \"health\", \"attack_power\", \"xp_reward\".\n"
+    "- \"name\" is a short, evocative creature name (2-4 words) that fits the context.\n"
+    "- \"level\", \"health\", \"attack_power\" and \"xp_reward\" are numbers. Copy them from the stats line.\n"
+    "Example answer:\n"
+    "{\"name\": \"Mossback Bog Troll\", \"level\": 4, \"health\": 168.5, \"attack_power\": 24.1, \"xp_reward\": 15.3}\n"
+    "\n"
+)
+
+QUESTS_PREFIX = (
+    "You are the Quest Board of a fantasy RPG. You write COMBAT quests for a hero.\n"
+    "Rules:\n"
+    "- Every quest is about killing monsters or clearing a dangerous area.\n"
+    "- Answer with a JSON list of exactly 3 objects and nothing else.\n"
+    "- Each object has exactly these keys: \"title\", \"description\", \"xp_reward\".\n"
+    "- \"title\" is short, like 'Slay 3 Dire Wolves', 'Exterminate the Goblin Nest' or 'Hunt the Elder Slime'.\n"
+    "- \"description\" is one sentence.\n"
+    "- \"xp_reward\" is a whole number close to the XP given below.\n"
+    "Example answer:\n"
+    "[{\"title\": \"Hunt the Elder Slime\", \"description\": \"A bloated slime is dissolving the village well.\", \"xp_reward\": 350}]\n"
+    "\n"
+)
+
+QUEST_ENEMIES_PREFIX = (
+    "You are the Game Master of a fantasy RPG. You populate a quest with the enemies the hero must defeat.\n"
+    "Rules:\n"
+    "- Answer with a JSON list of exactly 3 objects and nothing else.\n"
+    "- Each object has exactly these keys: \"name\", \"health\", \"attack_power\", \"xp_reward\".\n"
+    "- The enemies must match the quest title and be a fair fight for the hero's level.\n"
+    "\n"
+)
+
+SHOP_PREFIX = (
+    "You are the merchant of a fantasy RPG. You stock your shelf with equipment.\n"
+    "Rules:\n"
+    "- Answer with a JSON list of exactly 3 objects and nothing else.\n"
+    "- Each object has exactly these keys: \"name\", \"item_type\", \"health_bonus\", \"power_bonus\", \"price\".\n"
+    "- \"item_type\" is one of: HEAD, CHEST, FEET, GLOVES, RING, AMULET, WEAPON.\n"
+    "- Bonuses and price (in gold) are whole numbers that grow with the hero's level.\n"
+    "Example answer:\n"
+    "[{\"name\": \"Runed Signet\", \"item_type\": \"RING\", \"health_bonus\": 12, \"power_bonus\": 4, \"price\": 60}]\n"
+    "\n"
+)
+
+# Upper bound on generated tokens per endpoint - enough for the JSON, not for rambling
+NUM_PREDICT = {
+    "generate_enemy": 96,
+    "generate_quests": 320,
+    "generate_quest_enemies": 256,
+    "generate_shop_items": 256,
+}
+
+def ollama_payload(endpoint, prompt, **options):
+    """Generate request with the shared settings every endpoint uses"""
+    return {
+        "model": MODEL_NAME,
+        "prompt": prompt,
+        "stream": False,
+        "format": SCHEMAS[endpoint][1],
+        "keep_alive": KEEP_ALIVE,
+        "options": {"num_predict": NUM_PREDICT[endpoint], **options},
+    }
+
+def enemy_payload(req):
     level = req.get('player_level', 1)
     health = req.get('player_health', 100)
     power = req.get('player_strength', 50)
@@ -33,111 +199,202 @@ def generate_enemy(req: dict):
     enemy_health = round(random.uniform(health * 1.5, health * 1.8), 2)
     enemy_power = round(random.uniform(power * 0.4, power * 0.6), 2)
     enemy_xp_reward = round(random.uniform(power * 0.2, power * 0.4), 2)
-    
-    prompt = (
-        "You are a Game Master for an RPG. Create a new enemy. "
-        f"The context is: {context}. "
-        f"Return ONLY a JSON object with this exact keys, no additional text : name, health({enemy_health}), level({level}) attack_power({enemy_power}), xp_reward({enemy_xp_reward})"
+
+    prompt = ENEMY_PREFIX + (
+        f"Context: {context}\n"
+        f"Stats: level {level}, health {enemy_health}, attack_power {enemy_power}, xp_reward {enemy_xp_reward}\n"
     )
+    return ollama_payload("generate_enemy", prompt)
 
-    print(f"--- PROMPT SENT TO OLLAMA ---\n{prompt}")
+def quests_payload(req):
+    player_level = req.get('player_level', 1)
+    base_xp = int((player_level ** 1.5) * 50)
 
-    payload = {
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False
-    }
+    prompt = QUESTS_PREFIX + f"Hero level: {player_level}\nXP: {base_xp}\n"
+    # Slightly higher temperature for more monster variety
+    return ollama_payload("generate_quests", prompt, temperature=0.8)
+
+def quest_enemies_payload(req):
+    quest_title = req.get('quest_title', 'Monster Hunting')
+    player_level = req.get('player_level', 1)
+
+    prompt = QUEST_ENEMIES_PREFIX + f"Quest title: {quest_title}\nHero level: {player_level}\n"
+    return ollama_payload("generate_quest_enemies", prompt)
+
+def shop_payload(req):
+    level = req.get('player_level', 1)
+
+    prompt = SHOP_PREFIX + f"Hero level: {level}\n"
+    return ollama_payload("generate_shop_items", prompt)
+
+# endpoint -> (static prefix, payload builder)
+PAYLOADS = {
+    "generate_enemy": (ENEMY_PREFIX, enemy_payload),
+    "generate_quests": (QUESTS_PREFIX, quests_payload),
+    "generate_quest_enemies": (QUEST_ENEMIES_PREFIX, quest_enemies_payload),
+    "generate_shop_items": (SHOP_PREFIX, shop_payload),
+}
+
+def clean_json(text):
+    """Helper to extract JSON from the AI's chatty response"""
+    match = re.search(r'[\[{].*[\]}]', text, re.DOTALL)
+    if match:
+        return match.group(0)
+    return "{}"
 
+def repair(raw_text, many):
+    """Fix the usual near misses (wrong wrapper, aliased keys) without calling the model again"""
     try:
-        response = requests.post(OLLAMA_URL, json=payload)
-        response_json = response.json()
-        raw_text = response_json.get("response", "")
-        print(f"--- RAW AI RESPONSE ---\n{raw_text}")
-        
-        # Clean and Parse
         data = json.loads(clean_json(raw_text))
+    except ValueError:
+        return None
+
+    if many and isinstance(data, dict):
+        # {"quests": [...]} or a single record instead of a list
+        lists = [value for value in data.values() if isinstance(value, list)]
+        data = lists[0] if len(lists) == 1 else [data]
+    elif not many and isinstance(data, list):
+        data = data[0] if data else {}
+
+    records = data if many else [data]
+    if not all(isinstance(record, dict) for record in records):
+        return None
+    for record in records:
+        for alias, key in KEY_ALIASES.items():
+            if alias in record and key not in record:
+                record[key] = record.pop(alias)
+        if isinstance(record.get('item_type'), str):
+            record['item_type'] = record['item_type'].upper()
+    return data
+
+def call_ollama(endpoint, payload, timeout=None):
+    """Send one generate request to Ollama and record its timings"""
+    model = payload["model"]
+    logger.debug("prompt endpoint=%s\n%s", endpoint, payload["prompt"])
+    try:
+        response = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+        response.raise_for_status()
+        body = response.json()
+    except Exception:
+        telemetry.record_error(endpoint, model)
+        raise
+    telemetry.record_call(endpoint, model, body)
+    logger.debug("raw response endpoint=%s\n%s", endpoint, body.get("response", ""))
+    return body
+
+def validate(endpoint, model, raw_text, first_try):
+    """The validated answer, or None if even a local repair doesn't fit the schema"""
+    validator, _ = SCHEMAS[endpoint]
+    try:
+        data = validator.validate_json(raw_text)
+        telemetry.record_validation(endpoint, model, first_try=first_try)
         return data
+    except ValidationError:
+        pass
+
+    repaired = repair(raw_text, many=endpoint != "generate_enemy")
+    if repaired is not None:
+        try:
+            data = validator.validate_python(repaired)
+            telemetry.record_validation(endpoint, model, repaired=True)
+            return data
+        except ValidationError as e:
+            logger.info("unusable answer endpoint=%s model=%s: %s", endpoint, model, e.errors()[:3])
+    return None
+
+def generate(endpoint, payload):
+    """Walk the endpoint's model tiers until one answers with valid JSON in time.
+
+    Returns the last Ollama response and the validated data (None if no tier
+    managed). Answers are repaired locally before spending another
+    generation on them. Raises the last error if no tier answered at all.
+    """
+    deadline = time.monotonic() + BUDGETS[endpoint]
+    body, error, regenerate = None, None, False
+    for tier_index, tier in enumerate(ROUTES[endpoint]):
+        model = TIERS[tier]["model"]
+        for attempt in range(MAX_ATTEMPTS):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if regenerate:
+                telemetry.record_validation(endpoint, model, retried=True)
+            started = time.monotonic()
+            try:
+                body = call_ollama(endpoint, {**payload, "model": model}, timeout=min(TIERS[tier]["timeout"], remaining))
+            except requests.Timeout as e:
+                telemetry.record_tier(endpoint, tier, model, "deadline", time.monotonic() - started)
+                logger.warning("%s missed its deadline on %s, falling back", endpoint, model)
+                error = e
+                break
+            except Exception as e:
+                telemetry.record_tier(endpoint, tier, model, "error", time.monotonic() - started)
+                error = e
+                break
+
+            data = validate(endpoint, model, body.get("response", ""), first_try=tier_index == 0 and attempt == 0)
+            telemetry.record_tier(endpoint, tier, model, "ok" if data is not None else "invalid", time.monotonic() - started)
+            if data is not None:
+                return body, data
+            regenerate = True
+
+    if body is None:
+        raise error or TimeoutError(f"no time left for {endpoint}")
+    return body, None
+
+def list_response(endpoint, body, records):
+    """The Django side reads a JSON list from Ollama's "response" field"""
+    telemetry.record_parse(endpoint, body.get("model", MODEL_NAME), records is not None)
+    if records is None:
+        return body
+    return {**body, "response": json.dumps([record.model_dump() for record in records])}
+
+def warm_up():
+    """Load the model and put every static prefix into Ollama's prompt cache"""
+    for endpoint, (prefix, _) in PAYLOADS.items():
+        for tier in ROUTES[endpoint]:
+            payload = ollama_payload(endpoint, prefix)
+            payload["model"] = TIERS[tier]["model"]
+            payload["options"]["num_predict"] = 1
+            try:
+                call_ollama(f"warm_up_{endpoint}", payload, timeout=300)
+            except Exception as e:
+                logger.warning("warm-up of %s for %s failed: %s", payload["model"], endpoint, e)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return telemetry.render()
+
+@app.post("/generate-enemy/")
+def generate_enemy(req: dict):
+    payload = enemy_payload(req)
+
+    model = TIERS[ROUTES["generate_enemy"][0]]["model"]
+    try:
+        body, enemy = generate("generate_enemy", payload)
+        model = body.get("model", model)
+        if enemy is None:
+            raise ValueError("no valid enemy after retries")
+        telemetry.record_parse("generate_enemy", model, True)
+        return enemy.model_dump()
     except Exception as e:
+        telemetry.record_parse("generate_enemy", model, False)
+        telemetry.record_fallback("generate_enemy", model)
         return {"error": str(e), "name": "Glitch Ghost", "health": 50, "attack_power": 5, "xp_reward": 10}
 
 # Run with: uvicorn ai_generator:app --reload --port 8001
 
 @app.post("/generate-quests/")
 def generate_quests(req: dict):
-    player_level = req.get('player_level', 1)
-    base_xp = int((player_level ** 1.5) * 50)
-    
-    # Innovative prompt engineering to force specific quest types
-    prompt = (
-        f"You are a Quest Board for a fantasy RPG. Generate 3 unique COMBAT quests for a level {player_level} hero. "
-        "The theme MUST be killing monsters or clearing dangerous areas. "
-        "Each quest must have: 'title', 'description', and 'xp_reward'. "
-        "Example Titles: 'Slay 3 Dire Wolves', 'Exterminate the Goblin Nest', 'Hunt the Elder Slime'. "
-        f"XP rewards should be near {base_xp}. "
-        "Return ONLY a JSON list of objects. One sentence max for descriptions."
-    )
-    
-    print(f"--- PROMPT SENT TO AI --- \n {prompt}")
-
-    response = requests.post(OLLAMA_URL, json={
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False,
-        "format": "json",
-        "options": {
-            "temperature": 0.8,  # Slightly higher for more monster variety
-            "num_predict": 400
-        }
-    }, timeout=90)
-    
-    return response.json()
+    body, records = generate("generate_quests", quests_payload(req))
+    return list_response("generate_quests", body, records)
 
 @app.post("/generate-quest-enemies/")
 def generate_quest_enemies(req: dict):
-    quest_title = req.get('quest_title', 'Monster Hunting')
-    player_level = req.get('player_level', 1)
-    
-    # We ask the LLM to provide a specific count and type based on the title
-    prompt = (
-        f"Based on the quest title '{quest_title}', generate a JSON list of 3 enemies. "
-        f"Enemies should be appropriate for a Level {player_level} hero. "
-        "Each object must have: 'name', 'health', 'attack_power', and 'xp_reward'. "
-        "Return ONLY the JSON list."
-    )
-    print(f"--- PROMPT SENT TO OLLAMA --- \n {prompt}")
-
-    response = requests.post(OLLAMA_URL, json={
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False,
-        "format": "json"
-    }, timeout=90)
-    
-    print(f"--- RESPONSE FROM OLLAMA --- \n {response.json().get("response", "")}")
-
-    return response.json()
+    body, records = generate("generate_quest_enemies", quest_enemies_payload(req))
+    return list_response("generate_quest_enemies", body, records)
 
 @app.post("/generate-shop-items/")
 def generate_shop_items(req: dict):
-    level = req.get('player_level', 1)
-    types = "HEAD, CHEST, FEET, GLOVES, RING, AMULET, WEAPON"
-
-    prompt = (
-        f"Generate 3 unique RPG items for a Level {level} character. "
-        f"Each item must have a type from this list: [{types}]. "
-        "Return a JSON list with: 'name', 'item_type', 'health_bonus', 'power_bonus', 'price(10g)'."
-        "Return ONLY the JSON list."
-    )
-    
-    print(f"---- PROMPT SENT TO AI ---- \n {prompt}")
-
-    response = requests.post(OLLAMA_URL, json={
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False,
-        "format": "json"
-    }, timeout=120)
-
-    print(f"---- RESPONSE FROM AI ---- \n {response.json().get("response", "")}")
-    
-    return response.json()
\ No newline at end of file
+    body, records = generate("generate_shop_items", shop_payload(req))
+    return list_response("generate_shop_items", body, records)
\ No newline at end of file
@@ -0,0 +1,132 @@
+# ai_telemetry.py
+# Per-endpoint numbers about the Ollama calls made by ai_generator.py.
+# Ollama reports its own timings (in nanoseconds) with every non-streamed
+# response, so we just add those up and expose them at GET /metrics.
+import logging
+import threading
+
+logger = logging.getLogger("ai_generator")
+
+NS = 1_000_000_000
+
+# A model load above this many seconds means Ollama had to (re)load it from disk
+COLD_LOAD_SECONDS = 1.0
+
+COUNTERS = {
+    'requests': ('llm_requests_total', "Calls made to Ollama"),
+    'errors': ('llm_errors_total', "Calls that failed before a response came back"),
+    'prompt_tokens': ('llm_prompt_tokens_total', "Prompt tokens evaluated (prompt_eval_count)"),
+    'output_tokens': ('llm_output_tokens_total', "Tokens generated (eval_count)"),
+    'eval_seconds': ('llm_eval_seconds_total', "Time spent generating tokens (eval_duration)"),
+    'load_seconds': ('llm_load_seconds_total', "Time spent loading the model (load_duration)"),
+    'total_seconds': ('llm_total_seconds_total', "Wall time reported by Ollama (total_duration)"),
+    'cold_loads': ('llm_cold_loads_total', f"Calls where loading the model took over {COLD_LOAD_SECONDS}s"),
+    'parse_ok': ('llm_parse_success_total', "Responses that parsed into the expected JSON"),
+    'parse_failed': ('llm_parse_failure_total', "Responses that could not be parsed"),
+    'fallbacks': ('llm_fallbacks_total', "Times canned fallback content was served instead"),
+    'valid_first_try': ('llm_valid_first_try_total', "Answers that matched the schema on the first generation"),
+    'repaired': ('llm_repaired_total', "Answers that only matched the schema after a local repair"),
+    'retries': ('llm_schema_retries_total', "Extra generations because an answer did not match the schema"),
+}
+
+
+class Telemetry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.last_tokens_per_second = {}
+        self.tiers = {}  # (endpoint, tier, model) -> {outcome: [count, seconds]}
+
+    def _add(self, endpoint, model, **values):
+        with self.lock:
+            stats = self.stats.setdefault((endpoint, model), dict.fromkeys(COUNTERS, 0))
+            for key, value in values.items():
+                stats[key] += value
+
+    def record_call(self, endpoint, model, body):
+        """Record the timing fields of one Ollama response body."""
+        eval_seconds = body.get('eval_duration', 0) / NS
+        load_seconds = body.get('load_duration', 0) / NS
+        output_tokens = body.get('eval_count', 0)
+
+        self._add(
+            endpoint, model,
+            requests=1,
+            prompt_tokens=body.get('prompt_eval_count', 0),
+            output_tokens=output_tokens,
+            eval_seconds=eval_seconds,
+            load_seconds=load_seconds,
+            total_seconds=body.get('total_duration', 0) / NS,
+            cold_loads=int(load_seconds > COLD_LOAD_SECONDS),
+        )
+        tokens_per_second = output_tokens / eval_seconds if eval_seconds else 0
+        with self.lock:
+            self.last_tokens_per_second[(endpoint, model)] = tokens_per_second
+
+        logger.info(
+            "llm_call endpoint=%s model=%s prompt_tokens=%s output_tokens=%s tokens_per_s=%.1f load_s=%.2f total_s=%.2f",
+            endpoint, model, body.get('prompt_eval_count', 0), output_tokens, tokens_per_second,
+            load_seconds, body.get('total_duration', 0) / NS,
+        )
+
+    def record_error(self, endpoint, model):
+        self._add(endpoint, model, requests=1, errors=1)
+
+    def record_parse(self, endpoint, model, ok):
+        self._add(endpoint, model, **{'parse_ok' if ok else 'parse_failed': 1})
+
+    def record_validation(self, endpoint, model, first_try=False, repaired=False, retried=False):
+        self._add(endpoint, model, valid_first_try=int(first_try), repaired=int(repaired), retries=int(retried))
+
+    def record_tier(self, endpoint, tier, model, outcome, seconds):
+        """One call made by the model router (outcome: ok, invalid, deadline or error)."""
+        with self.lock:
+            outcomes = self.tiers.setdefault((endpoint, tier, model), {})
+            count, total = outcomes.get(outcome, (0, 0.0))
+            outcomes[outcome] = (count + 1, total + seconds)
+
+    def record_fallback(self, endpoint, model):
+        self._add(endpoint, model, fallbacks=1)
+
+    def render(self):
+        """Prometheus text format."""
+        with self.lock:
+            stats = {key: dict(values) for key, values in self.stats.items()}
+            speeds = dict(self.last_tokens_per_second)
+            tiers = {key: dict(outcomes) for key, outcomes in self.tiers.items()}
+
+        lines = []
+        for key, (metric, help_text) in COUNTERS.items():
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (endpoint, model), values in sorted(stats.items()):
+                lines.append(f'{metric}{{endpoint="{endpoint}",model="{model}"}} {values[key]}')
+
+        # Share of requests whose very first answer was usable as is
+        lines.append("# HELP llm_valid_first_try_ratio Requests answered with valid JSON on the first generation")
+        lines.append("# TYPE llm_valid_first_try_ratio gauge")
+        for (endpoint, model), values in sorted(stats.items()):
+            answered = values['parse_ok'] + values['parse_failed']
+            if answered:
+                lines.append(f'llm_valid_first_try_ratio{{endpoint="{endpoint}",model="{model}"}} {values["valid_first_try"] / answered:.3f}')
+
+        lines.append("# HELP llm_tier_requests_total Calls per routing tier and outcome (ok, invalid, deadline, error)")
+        lines.append("# TYPE llm_tier_requests_total counter")
+        for (endpoint, tier, model), outcomes in sorted(tiers.items()):
+            for outcome, (count, _) in sorted(outcomes.items()):
+                lines.append(f'llm_tier_requests_total{{endpoint="{endpoint}",tier="{tier}",model="{model}",outcome="{outcome}"}} {count}')
+        lines.append("# HELP llm_tier_seconds_total Wall time of the calls per routing tier and outcome")
+        lines.append("# TYPE llm_tier_seconds_total counter")
+        for (endpoint, tier, model), outcomes in sorted(tiers.items()):
+            for outcome, (_, seconds) in sorted(outcomes.items()):
+                lines.append(f'llm_tier_seconds_total{{endpoint="{endpoint}",tier="{tier}",model="{model}",outcome="{outcome}"}} {seconds:.3f}')
+
+        lines.append("# HELP llm_tokens_per_second Generation speed of the latest call")
+        lines.append("# TYPE llm_tokens_per_second gauge")
+        for (endpoint, model), speed in sorted(speeds.items()):
+            lines.append(f'llm_tokens_per_second{{endpoint="{endpoint}",model="{model}"}} {speed:.2f}')
+        return "\n".join(lines) + "\n"
+
+
+telemetry = Telemetry()
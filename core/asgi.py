@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
+# Under ASGI the views waiting on the AI service run as coroutines, so one
+# process can keep hundreds of generations in flight (see game/async_views.py)
+os.environ.setdefault('GAME_ASYNC_VIEWS', '1')
+
 application = get_asgi_application()
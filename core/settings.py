@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,9 +24,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-gfntsxb#b2t4+#zemjngt%dv5e9_8rq$-unaee9gwqwx967!0x'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', 'True') == 'True'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -41,8 +42,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it times everything below it
+    'game.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Needs the session to keep players on the primary after they write
+    'game.replicas.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -67,6 +72,16 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # Compile every template once per process instead of on each render
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'core.wsgi.application'
 
 
@@ -77,6 +92,43 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # requests wait for each other instead of failing with
+            # "database is locked" when a read turns into a write
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    }
+}
+
+# Optional read replica for the read-mostly views (game/replicas.py). Locally,
+# point GAME_REPLICA_DB at a second SQLite file and keep it fresh with
+# `python manage.py sync_replica`.
+if os.environ.get('GAME_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['GAME_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['game.replicas.ReplicaRouter']
+
+# Views that may read from the replica, and how far it may lag behind: for
+# that long after a POST the session reads from the primary again
+REPLICA_READ_VIEWS = ['characters_listing', 'select_enemy', 'quest_log', 'shop_page']
+REPLICA_MAX_LAG_SECONDS = 5
+
+
+# Cache
+# Point GAME_CACHE_BACKEND/GAME_CACHE_LOCATION at a shared backend (Redis,
+# Memcached, ...) when running more than one worker process.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('GAME_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('GAME_CACHE_LOCATION', 'game-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000} if 'GAME_CACHE_BACKEND' not in os.environ else {},
     }
 }
 
@@ -116,3 +168,118 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Outside of DEBUG collectstatic writes content-hashed, precompressed files
+# which game.staticfiles.serve hands out with far-future cache headers
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'game.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+
+# Game settings
+
+# Base URL of the FastAPI service in ai_generator.py
+AI_SERVICE_URL = os.environ.get('AI_SERVICE_URL', 'http://localhost:8001')
+
+# Per endpoint: timeout of a single attempt and the latency budget for all
+# attempts together (seconds). See game/ai_service.py.
+AI_SERVICE_ENDPOINTS = {
+    'generate-enemy': {'timeout': 30, 'budget': 45},
+    'generate-quests': {'timeout': 60, 'budget': 90},
+    'generate-shop-items': {'timeout': 60, 'budget': 90},
+}
+AI_SERVICE_RETRIES = 2
+AI_SERVICE_POOL_SIZE = 20
+
+# After this many failures in a row stop calling the AI service for a while
+# and serve procedural content instead
+AI_CIRCUIT_FAILURE_THRESHOLD = 5
+AI_CIRCUIT_RESET_SECONDS = 30
+
+# Admission control (game/admission.py): every hero may start BURST
+# generations at once and then PER_MINUTE more per minute. At most
+# MAX_CONCURRENT_CALLS model calls run at once per process and MAX_QUEUED_CALLS
+# wait; background pre-generation never takes the last RESERVED slots. The
+# caps can be raised from the environment (loadtest/bench_async.py needs that).
+AI_RATE_LIMIT_BURST = 5
+AI_RATE_LIMIT_PER_MINUTE = 10
+AI_MAX_CONCURRENT_CALLS = int(os.environ.get('GAME_AI_MAX_CONCURRENT_CALLS', 4))
+AI_MAX_QUEUED_CALLS = int(os.environ.get('GAME_AI_MAX_QUEUED_CALLS', 16))
+AI_INTERACTIVE_RESERVED_CALLS = 1
+
+# Run game/tasks.py jobs in the calling thread instead of the background
+# pool (the simulate_world command does this to measure them per action)
+BACKGROUND_TASKS_INLINE = False
+
+# Serve the AI-bound views as coroutines (set by core/asgi.py)
+ASYNC_AI_VIEWS = os.environ.get('GAME_ASYNC_VIEWS') == '1'
+
+# Heroes are grouped into level bands of this size (levels 1-5, 6-10, ...)
+LEVEL_BAND_SIZE = 5
+
+# Highest level the background jobs pre-generate content for
+MAX_PREGENERATED_LEVEL = 50
+
+# Shop stock per level band and how long it stays on the shelves
+SHOP_ITEMS_PER_BAND = 6
+SHOP_ROTATION_HOURS = 24
+
+# How many unassigned quests each level band's board should hold
+QUEST_POOL_DEPTH = 6
+
+# How many of the oldest unclaimed quests a Refresh Quests click replaces
+QUEST_REFRESH_COUNT = 3
+
+# How many of the cheapest destinations the character page lists
+TRAVEL_PANEL_SIZE = 10
+
+# Combat events are written in batches of this size, or once the oldest
+# buffered one is this old (game/combat_log.py), and kept this many days
+COMBAT_LOG_BATCH_SIZE = 200
+COMBAT_LOG_FLUSH_SECONDS = 5
+COMBAT_LOG_RETENTION_DAYS = 30
+
+# Idempotency keys of the quest, summon and shop forms (game/idempotency.py):
+# which cache remembers them, for how long, and how long a repeated POST
+# waits for the first one to finish - in an async view, and in a sync view,
+# where the wait blocks a worker
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+IDEMPOTENCY_TTL_SECONDS = 600
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_SYNC_WAIT_SECONDS = 0
+
+# Pre-generated content built by the build_content_pack command
+# (game/content_pack.py). Without the file everything is generated live.
+CONTENT_PACK_PATH = os.environ.get('GAME_CONTENT_PACK', str(BASE_DIR / 'content_pack.sqlite3'))
+
+# Which cache holds the per-character page contexts and how long they live
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 300
+
+# Per-view metrics (see game/metrics.py). Give every worker process the same
+# directory to have /game/metrics add up all of them.
+METRICS_DIR = os.environ.get('GAME_METRICS_DIR')
+METRICS_FLUSH_SECONDS = 5
+
+# Failures the game app falls back from (AI calls, background jobs, the
+# content pack, combat log writes) are logged under the "game" logger
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'game': {
+            'handlers': ['console'],
+            'level': os.environ.get('GAME_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
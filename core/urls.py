@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from game import staticfiles
 from game import views as game_views
 
 urlpatterns = [
@@ -7,4 +9,10 @@ urlpatterns = [
     # This makes http://127.0.0.1:8000/ show the main menu
     path('', game_views.main_menu, name='root_menu'),
     path('game/', include('game.urls')),
-]
\ No newline at end of file
+]
+
+if not settings.DEBUG:
+    # runserver serves static files itself while DEBUG is on
+    urlpatterns += [
+        re_path(r'^static/(?P<path>.*)$', staticfiles.serve),
+    ]
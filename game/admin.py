@@ -1,9 +1,149 @@
-from django.contrib import admin
-from .models import Character, Item, Quest, Location, Enemy
-
-# This tells Django to show the Character section in the Admin dashboard
-admin.site.register(Character)
-admin.site.register(Item)
-admin.site.register(Quest)
-admin.site.register(Location)
-admin.site.register(Enemy)
\ No newline at end of file
+from django.contrib import admin, messages
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import page_cache, shop
+from .models import Character, Item, Quest, Location, Enemy, Route, SpawnEntry
+
+# The tables grow with every hero, so nothing here loads a whole table:
+# foreign keys use raw-id/autocomplete widgets instead of dropdowns, list pages
+# join what they print, search is "starts with" on an indexed NOCASE column
+# (or an exact id) and the bulk actions are plain UPDATE/DELETE queries.
+# NOCASE is a SQLite collation - see the note in models.py before moving to
+# another database.
+# Those skip the signals, so the actions bump the page cache themselves.
+
+
+DELETE_CHUNK = 500
+
+
+def _delete_ids(model, ids):
+    # Plain DELETEs, no per-row signals or cascades - only for rows nothing points at
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), DELETE_CHUNK):
+            chunk = ids[start:start + DELETE_CHUNK]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            deleted += cursor.rowcount
+    return deleted
+
+
+# ===== CHARACTER ADMIN =====
+@admin.register(Character)
+class CharacterAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'level', 'xp', 'health', 'max_health', 'gold_amount', 'current_location', 'current_enemy']
+    list_select_related = ['current_location', 'current_enemy']
+    list_filter = ['current_location']
+    search_fields = ['=id', '^name']
+    raw_id_fields = ['current_enemy']
+    ordering = ['-id']
+    show_full_result_count = False
+    actions = ['reset_heroes']
+
+    @admin.action(description="Reset selected heroes (full health, out of combat)")
+    def reset_heroes(self, request, queryset):
+        char_ids = list(queryset.values_list('id', flat=True))
+        updated = Character.objects.filter(pk__in=char_ids).update(
+            health=F('max_health'), current_enemy=None, updated_at=timezone.now()
+        )
+        page_cache.bump_hero(*char_ids)
+        self.message_user(request, f"Reset {updated} heroes.", messages.SUCCESS)
+
+
+# ===== ENEMY ADMIN =====
+@admin.register(Enemy)
+class EnemyAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'level', 'health', 'attack_power', 'xp_reward', 'is_defeated', 'location', 'quest']
+    # Quest.__str__ prints the hero's name
+    list_select_related = ['location', 'quest__assigned_to']
+    list_filter = ['is_defeated', ('quest', admin.EmptyFieldListFilter)]
+    search_fields = ['=id', '^name']
+    raw_id_fields = ['quest']
+    autocomplete_fields = ['location']
+    ordering = ['-id']
+    show_full_result_count = False
+    actions = ['purge_defeated']
+
+    @admin.action(description="Delete defeated enemies (arena and finished quests)")
+    def purge_defeated(self, request, queryset):
+        # Defeated enemies of running quests still count towards the progress bar
+        purge = queryset.filter(Q(quest__isnull=True) | Q(quest__is_completed=True), is_defeated=True)
+        enemy_ids = list(purge.values_list('id', flat=True))
+        fighting = Character.objects.filter(current_enemy__in=enemy_ids)
+        char_ids = list(fighting.values_list('id', flat=True))
+        char_ids += purge.filter(quest__isnull=False).values_list('quest__assigned_to_id', flat=True).distinct()
+
+        # What on_delete=SET_NULL would have done, in one UPDATE
+        fighting.update(current_enemy=None, updated_at=timezone.now())
+        deleted = _delete_ids(Enemy, enemy_ids)
+        page_cache.bump_hero(*char_ids)
+        self.message_user(request, f"Deleted {deleted} defeated enemies.", messages.SUCCESS)
+
+
+# ===== ITEM ADMIN =====
+@admin.register(Item)
+class ItemAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'item_type', 'price', 'health_bonus', 'power_bonus', 'is_in_shop', 'level_band', 'owner', 'is_equipped']
+    list_select_related = ['owner']
+    list_filter = ['is_in_shop', 'level_band', 'item_type', 'is_equipped']
+    search_fields = ['=id', '^name']
+    autocomplete_fields = ['owner']
+    ordering = ['-id']
+    show_full_result_count = False
+    actions = ['restock_shop']
+
+    @admin.action(description="Restock the shop shelves of the selected items")
+    def restock_shop(self, request, queryset):
+        bands = set(queryset.values_list('level_band', flat=True).distinct())
+        unsold = Item.objects.filter(is_in_shop=True, owner__isnull=True, level_band__in=bands)
+        old_ids = list(unsold.values_list('id', flat=True))
+
+        # A fresh shelf first (one INSERT per band), then the old stock goes in one DELETE
+        stocked = sum(len(shop.stock_band(band, use_ai=False)) for band in bands)
+        deleted = _delete_ids(Item, old_ids)
+        self.message_user(
+            request,
+            f"Restocked {len(bands)} shelves with {stocked} items, removed {deleted} unsold ones.",
+            messages.SUCCESS,
+        )
+
+
+# ===== QUEST ADMIN =====
+@admin.register(Quest)
+class QuestAdmin(admin.ModelAdmin):
+    list_display = ['id', 'title', 'assigned_to', 'level_band', 'xp_reward', 'is_completed']
+    # __str__ prints the hero's name
+    list_select_related = ['assigned_to']
+    list_filter = ['is_completed', 'level_band', ('assigned_to', admin.EmptyFieldListFilter)]
+    search_fields = ['=id', '^title']
+    autocomplete_fields = ['assigned_to']
+    ordering = ['-id']
+    show_full_result_count = False
+
+
+# ===== LOCATION ADMIN =====
+class SpawnEntryInline(admin.TabularInline):
+    model = SpawnEntry
+    extra = 1
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name']
+    inlines = [SpawnEntryInline]
+    ordering = ['name']
+    search_fields = ['^name']
+
+
+# ===== ROUTE ADMIN =====
+@admin.register(Route)
+class RouteAdmin(admin.ModelAdmin):
+    list_display = ['id', 'start', 'end', 'cost']
+    list_select_related = ['start', 'end']
+    search_fields = ['^start__name', '^end__name']
+    autocomplete_fields = ['start', 'end']
+    ordering = ['-id']
+    show_full_result_count = False
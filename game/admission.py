@@ -0,0 +1,232 @@
+# Admission control for the AI generation path.
+#
+# Two layers:
+# - every hero has a token bucket, so one player spamming "new enemy" can't
+#   queue dozens of generations on their own
+# - all model calls in the process go through one Gate: a fixed number run at
+#   once, a bounded number wait, and waiting interactive calls always go
+#   before background pre-generation (which also never gets the last slots)
+#
+# Both are per process, like the circuit breaker in ai_service.py.
+import asyncio
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.shortcuts import render
+
+from .metrics import REGISTRY
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority = contextvars.ContextVar('ai_priority', default=INTERACTIVE)
+
+WAIT_BUCKETS = (0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+
+
+class Busy(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(Busy):
+    pass
+
+
+class QueueFull(Busy):
+    pass
+
+
+# ===== PER-HERO TOKEN BUCKETS =====
+class TokenBuckets:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}  # key -> (tokens, last refill)
+
+    def take(self, key):
+        burst = settings.AI_RATE_LIMIT_BURST
+        rate = settings.AI_RATE_LIMIT_PER_MINUTE / 60
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                raise RateLimited("Slow down! Your hero is still waiting on the last summons.", (1 - tokens) / rate)
+            self.buckets[key] = (tokens - 1, now)
+
+            # Full buckets carry no information, drop them so the dict doesn't grow forever
+            if len(self.buckets) > 10000:
+                self.buckets = {k: v for k, v in self.buckets.items() if v[0] + (now - v[1]) * rate < burst}
+
+
+buckets = TokenBuckets()
+
+
+# ===== CONCURRENCY GATE =====
+class Gate:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.active = 0
+        self.waiting = []  # heap of (priority, arrival) tickets
+        self.arrivals = itertools.count()
+
+    def _can_run(self, priority):
+        limit = settings.AI_MAX_CONCURRENT_CALLS
+        if priority == BACKGROUND:
+            limit -= settings.AI_INTERACTIVE_RESERVED_CALLS
+        return self.active < limit
+
+    def _first_in_line(self, priority):
+        return not self.waiting or self.waiting[0][0] > priority
+
+    def try_acquire(self, priority):
+        with self.cond:
+            if self._first_in_line(priority) and self._can_run(priority):
+                self.active += 1
+                return True
+            return False
+
+    def full(self):
+        with self.cond:
+            return len(self.waiting) >= settings.AI_MAX_QUEUED_CALLS
+
+    def acquire(self, priority, timeout):
+        with self.cond:
+            if self._first_in_line(priority) and self._can_run(priority):
+                self.active += 1
+                return
+            if len(self.waiting) >= settings.AI_MAX_QUEUED_CALLS:
+                raise QueueFull("The oracle is overwhelmed, try again in a moment.", 5)
+
+            ticket = (priority, next(self.arrivals))
+            heapq.heappush(self.waiting, ticket)
+            deadline = time.monotonic() + timeout
+            try:
+                while not (self.waiting[0] == ticket and self._can_run(priority)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise QueueFull("Waited too long for the oracle, try again in a moment.", 5)
+                    self.cond.wait(remaining)
+                heapq.heappop(self.waiting)
+                self.active += 1
+            except BaseException:
+                if ticket in self.waiting:
+                    self.waiting.remove(ticket)
+                    heapq.heapify(self.waiting)
+                raise
+            finally:
+                # Whoever is next in line may be able to run too
+                self.cond.notify_all()
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return self.active, len(self.waiting)
+
+
+gate = Gate()
+
+
+def _label():
+    return 'background' if _priority.get() == BACKGROUND else 'interactive'
+
+
+@contextlib.contextmanager
+def slot(timeout):
+    """Hold one of the model call slots for the duration of the block."""
+    priority = _priority.get()
+    started = time.monotonic()
+    gate.acquire(priority, timeout)
+    REGISTRY.observe('game_ai_queue_wait_seconds', (('priority', _label()),), time.monotonic() - started, WAIT_BUCKETS)
+    try:
+        yield
+    finally:
+        gate.release()
+
+
+def _release_abandoned(waiter):
+    if not waiter.cancelled() and waiter.exception() is None:
+        gate.release()
+
+
+@contextlib.asynccontextmanager
+async def aslot(timeout):
+    priority = _priority.get()
+    started = time.monotonic()
+    # Only park a thread when there actually is a queue
+    if not gate.try_acquire(priority):
+        waiter = asyncio.ensure_future(asyncio.to_thread(gate.acquire, priority, timeout))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # The thread can't be stopped and may still get the slot after we
+            # are gone - hand it straight back when it does
+            waiter.add_done_callback(_release_abandoned)
+            raise
+    REGISTRY.observe('game_ai_queue_wait_seconds', (('priority', _label()),), time.monotonic() - started, WAIT_BUCKETS)
+    try:
+        yield
+    finally:
+        gate.release()
+
+
+def background(func):
+    """Run func with background priority (used by game/tasks.py)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _priority.set(BACKGROUND)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _priority.reset(token)
+    return wrapper
+
+
+# ===== VIEW DECORATOR =====
+def admit(char_id):
+    """Raise Busy if this hero may not start another generation right now."""
+    if gate.full():
+        raise QueueFull("The oracle is overwhelmed, try again in a moment.", 5)
+    buckets.take(char_id)
+
+
+def _busy_response(request, char_id, error):
+    REGISTRY.inc('game_ai_rejected_total', (('reason', type(error).__name__),))
+    status = 429 if isinstance(error, RateLimited) else 503
+    response = render(request, 'game/busy.html', {'char_id': char_id, 'message': str(error)}, status=status)
+    response['Retry-After'] = str(max(1, round(error.retry_after)))
+    return response
+
+
+def rate_limited(view):
+    """Guard a generation view (sync or async) taking a char_id."""
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, char_id, *args, **kwargs):
+            try:
+                admit(char_id)
+            except Busy as e:
+                return _busy_response(request, char_id, e)
+            return await view(request, char_id, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, char_id, *args, **kwargs):
+        try:
+            admit(char_id)
+        except Busy as e:
+            return _busy_response(request, char_id, e)
+        return view(request, char_id, *args, **kwargs)
+    return wrapper
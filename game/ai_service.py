@@ -0,0 +1,339 @@
+# Client for the FastAPI service in ai_generator.py.
+#
+# All calls share one pooled keep-alive connection pool (one for the sync
+# views, one per event loop for game/async_views.py). Every endpoint has its
+# own per-attempt timeout and a total latency budget; failed attempts are
+# retried with jittered backoff while the budget lasts. A circuit breaker
+# stops calling the service after repeated failures so workers don't pile up
+# behind a hung model.
+#
+# Every call also needs one of the slots handed out by game/admission.py.
+#
+# Functions return plain python data or raise AIServiceError. Pass
+# fallback=True to get procedural content instead of an exception.
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from . import admission, procedural
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 0.5
+
+
+class AIServiceError(Exception):
+    pass
+
+
+class AIServiceUnavailable(AIServiceError):
+    # The circuit breaker is open - the service was not called at all
+    pass
+
+
+class AIServiceBusy(AIServiceError):
+    # No free slot in game/admission.py within the budget
+    pass
+
+
+# ===== CIRCUIT BREAKER =====
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if time.monotonic() - self.opened_at >= settings.AI_CIRCUIT_RESET_SECONDS:
+                # Let exactly one request through to see if the service is back
+                # (and another one if that probe never reported back)
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= settings.AI_CIRCUIT_FAILURE_THRESHOLD:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker()
+
+
+# ===== TRANSPORT =====
+_session = None
+_session_lock = threading.Lock()
+_async_clients = {}
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=settings.AI_SERVICE_POOL_SIZE, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
+def _get_async_client():
+    # httpx clients belong to the event loop that created them
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limits = httpx.Limits(
+            max_connections=settings.AI_SERVICE_POOL_SIZE * 10,
+            max_keepalive_connections=settings.AI_SERVICE_POOL_SIZE,
+        )
+        client = _async_clients[loop] = httpx.AsyncClient(limits=limits)
+    return client
+
+
+def _backoff(attempt, remaining):
+    # Full jitter, so retrying workers don't all hit the service at once
+    return min(random.uniform(0, BACKOFF_BASE_SECONDS * 2 ** attempt), max(remaining, 0))
+
+
+def _deadline(endpoint):
+    return time.monotonic() + settings.AI_SERVICE_ENDPOINTS[endpoint]['budget']
+
+
+def _attempts(endpoint, deadline):
+    # Yields (attempt, timeout) until the retries or the budget run out
+    config = settings.AI_SERVICE_ENDPOINTS[endpoint]
+    for attempt in range(settings.AI_SERVICE_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        yield attempt, min(config['timeout'], remaining)
+
+
+def _record(endpoint, outcome):
+    REGISTRY.inc('game_ai_calls_total', (('endpoint', endpoint), ('outcome', outcome)))
+
+
+def _busy(endpoint, error):
+    _record(endpoint, 'busy')
+    return AIServiceBusy(f"{endpoint} not started: {error}")
+
+
+def _retryable(error):
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return True
+
+
+def _post(endpoint, payload):
+    if not breaker.allow():
+        _record(endpoint, 'rejected')
+        raise AIServiceUnavailable(f"AI service circuit is open, skipped {endpoint}")
+
+    deadline = _deadline(endpoint)
+    try:
+        with admission.slot(deadline - time.monotonic()):
+            return _send(endpoint, payload, deadline)
+    except admission.Busy as e:
+        raise _busy(endpoint, e) from e
+
+
+def _send(endpoint, payload, deadline):
+    url = f"{settings.AI_SERVICE_URL}/{endpoint}/"
+    error = None
+    for attempt, timeout in _attempts(endpoint, deadline):
+        if attempt:
+            time.sleep(_backoff(attempt, deadline - time.monotonic()))
+        try:
+            response = _get_session().post(url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            error = e
+            _record(endpoint, 'error')
+            if not _retryable(e):
+                # A 4xx is our request's fault, not a sick service - keep it away from the breaker
+                raise AIServiceError(f"{endpoint} rejected: {e}") from e
+            continue
+        breaker.record_success()
+        _record(endpoint, 'ok')
+        return data
+
+    breaker.record_failure()
+    raise AIServiceError(f"{endpoint} failed: {error}")
+
+
+async def _apost(endpoint, payload):
+    if not breaker.allow():
+        _record(endpoint, 'rejected')
+        raise AIServiceUnavailable(f"AI service circuit is open, skipped {endpoint}")
+
+    deadline = _deadline(endpoint)
+    try:
+        async with admission.aslot(deadline - time.monotonic()):
+            return await _asend(endpoint, payload, deadline)
+    except admission.Busy as e:
+        raise _busy(endpoint, e) from e
+
+
+async def _asend(endpoint, payload, deadline):
+    url = f"{settings.AI_SERVICE_URL}/{endpoint}/"
+    error = None
+    for attempt, timeout in _attempts(endpoint, deadline):
+        if attempt:
+            await asyncio.sleep(_backoff(attempt, deadline - time.monotonic()))
+        try:
+            response = await _get_async_client().post(url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            error = e
+            _record(endpoint, 'error')
+            if not _retryable(e):
+                # A 4xx is our request's fault, not a sick service - keep it away from the breaker
+                raise AIServiceError(f"{endpoint} rejected: {e}") from e
+            continue
+        breaker.record_success()
+        _record(endpoint, 'ok')
+        return data
+
+    breaker.record_failure()
+    raise AIServiceError(f"{endpoint} failed: {error}")
+
+
+# ===== PARSING =====
+def _json_list(raw_text):
+    # Regex to ensure we only get the JSON array out of the model's answer
+    json_match = re.search(r'\[.*\]', raw_text, re.DOTALL)
+    if not json_match:
+        raise AIServiceError("AI response did not contain a JSON list")
+    return json.loads(json_match.group())
+
+
+def _enemy(data, payload):
+    return {
+        'name': data['name'],
+        'level': int(data.get('level', payload.get('player_level', 1))),
+        'health': int(data['health']),
+        'attack_power': int(data['attack_power']),
+        'xp_reward': int(data.get('xp_reward', 10)),
+    }
+
+
+def _fallback_enemy(payload):
+    return procedural.enemy(
+        payload.get('player_level', 1),
+        payload.get('player_health', 100),
+        payload.get('player_strength', 50),
+    )
+
+
+def _shop_items(data):
+    items = []
+    for raw in _json_list(data.get("response", "[]")):
+        items.append({
+            'name': raw.get('name', 'Relic'),
+            'item_type': str(raw.get('item_type', 'WEAPON')).upper(),  # Force uppercase to match choices
+            'health_bonus': int(raw.get('health_bonus', 0)),
+            'power_bonus': int(raw.get('power_bonus', 0)),
+            # The prompt asks for 'price(10g)' so the model uses both spellings
+            'price': int(raw.get('price', raw.get('price(10g)', 50))),
+        })
+    return items
+
+
+def _quests(data):
+    quests = []
+    for raw in _json_list(data.get("response", "[]")):
+        quests.append({
+            'title': raw.get('title', 'Unknown Task'),
+            'description': raw.get('description', 'No description provided.'),
+            'xp_reward': int(raw.get('xp_reward', 50)),
+        })
+    return quests
+
+
+# Anything that can go wrong between the request and a parsed result
+_FAILURES = (AIServiceError, KeyError, TypeError, ValueError)
+
+
+def _fail(endpoint, error, fallback):
+    if fallback is None:
+        if isinstance(error, AIServiceError):
+            raise error
+        raise AIServiceError(f"{endpoint} returned bad data: {error}") from error
+    logger.warning("AI %s failed, serving procedural content: %s", endpoint, error)
+    _record(endpoint, 'fallback')
+    return fallback()
+
+
+# ===== PUBLIC API =====
+def generate_enemy(fallback=False, **payload):
+    # payload is passed straight through: player_level, player_health, player_strength, context, ...
+    try:
+        return _enemy(_post("generate-enemy", payload), payload)
+    except _FAILURES as e:
+        return _fail("generate-enemy", e, (lambda: _fallback_enemy(payload)) if fallback else None)
+
+
+async def agenerate_enemy(fallback=False, **payload):
+    try:
+        return _enemy(await _apost("generate-enemy", payload), payload)
+    except _FAILURES as e:
+        return _fail("generate-enemy", e, (lambda: _fallback_enemy(payload)) if fallback else None)
+
+
+def generate_shop_items(level, fallback=False):
+    try:
+        return _shop_items(_post("generate-shop-items", {"player_level": level}))
+    except _FAILURES as e:
+        return _fail("generate-shop-items", e, (lambda: procedural.shop_items(level)) if fallback else None)
+
+
+async def agenerate_shop_items(level, fallback=False):
+    try:
+        return _shop_items(await _apost("generate-shop-items", {"player_level": level}))
+    except _FAILURES as e:
+        return _fail("generate-shop-items", e, (lambda: procedural.shop_items(level)) if fallback else None)
+
+
+def generate_quests(level, fallback=False):
+    try:
+        return _quests(_post("generate-quests", {"player_level": level}))
+    except _FAILURES as e:
+        return _fail("generate-quests", e, (lambda: procedural.quests(level)) if fallback else None)
+
+
+async def agenerate_quests(level, fallback=False):
+    try:
+        return _quests(await _apost("generate-quests", {"player_level": level}))
+    except _FAILURES as e:
+        return _fail("generate-quests", e, (lambda: procedural.quests(level)) if fallback else None)
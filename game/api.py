@@ -0,0 +1,127 @@
+# ===== STATE API =====
+# Versioned JSON views of a hero's state for clients that poll:
+#
+#   /game/api/v1/heroes/<id>/         stats, location, current enemy and quest ids
+#   /game/api/v1/heroes/<id>/enemy/   the enemy the hero is fighting (or null)
+#   /game/api/v1/heroes/<id>/quests/  active quests with their progress
+#
+# Every answer carries a strong ETag built from the hero's page cache version,
+# which anything touching the hero's rows bumps (see signals.py). A poll with a
+# matching If-None-Match gets 304 Not Modified after one cache read, without a
+# single query. The JSON itself is cached under the same version, so even a
+# changed state is usually built once per change, not once per poll.
+from django.db.models import Count, Q
+from django.http import Http404, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+from . import page_cache
+from .models import Character, Enemy, Quest
+
+API_VERSION = 1
+
+
+# ===== STATE SHAPES =====
+# Also used by the fragment responses of the battle and gear actions
+def hero_state(hero):
+    return {
+        'id': hero.id,
+        'name': hero.name,
+        'level': hero.level,
+        'xp': hero.xp,
+        'health': hero.health,
+        'max_health': hero.max_health,
+        'strength': hero.strength,
+        'gold': hero.gold_amount,
+        'location_id': hero.current_location_id,
+        'enemy_id': hero.current_enemy_id,
+    }
+
+
+def enemy_state(enemy):
+    if enemy is None:
+        return None
+    return {
+        'id': enemy.id,
+        'name': enemy.name,
+        'level': enemy.level,
+        'health': enemy.health,
+        'attack_power': enemy.attack_power,
+        'xp_reward': enemy.xp_reward,
+        'is_defeated': enemy.is_defeated,
+        'quest_id': enemy.quest_id,
+    }
+
+
+def item_state(item):
+    return {'id': item.id, 'name': item.name, 'item_type': item.item_type, 'is_equipped': item.is_equipped}
+
+
+def quest_state(quest):
+    return {
+        'id': quest.id,
+        'title': quest.title,
+        'xp_reward': quest.xp_reward,
+        'is_completed': quest.is_completed,
+        'enemies': quest.total_enemies,
+        'defeated': quest.defeated_enemies,
+    }
+
+
+# ===== VIEWS =====
+def _etag(request, char_id):
+    # Read before anything is built: a change that lands meanwhile only makes the next poll a 200
+    resource = request.resolver_match.url_name
+    return f'"v{API_VERSION}-{resource}-{char_id}-{page_cache.hero_version(char_id)}"'
+
+
+def _state_view(builder):
+    """GET view answering with builder(char_id), conditional on the hero's version."""
+    @require_safe
+    @condition(etag_func=_etag)
+    def view(request, char_id):
+        data = page_cache.hero_cached(char_id, f"api_v{API_VERSION}_{builder.__name__}", lambda: builder(char_id))
+        if data is None:
+            raise Http404("No such hero")
+        response = JsonResponse({'api_version': API_VERSION, **data})
+        # Clients may keep the answer but have to ask again (cheaply) every time
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return view
+
+
+def _hero(char_id):
+    hero = Character.objects.select_related('current_location').filter(pk=char_id).first()
+    if hero is None:
+        return None
+    state = hero_state(hero)
+    state['location'] = hero.current_location.name if hero.current_location else None
+    state['quest_ids'] = list(hero.quests.filter(is_completed=False).values_list('id', flat=True))
+    return {'hero': state}
+
+
+def _enemy(char_id):
+    hero = Character.objects.filter(pk=char_id).values('current_enemy_id').first()
+    if hero is None:
+        return None
+    enemy = Enemy.objects.filter(pk=hero['current_enemy_id']).first() if hero['current_enemy_id'] else None
+    return {'enemy': enemy_state(enemy)}
+
+
+def _quests(char_id):
+    if not Character.objects.filter(pk=char_id).exists():
+        return None
+    quests = (
+        Quest.objects.filter(assigned_to_id=char_id, is_completed=False)
+        .annotate(
+            total_enemies=Count('enemies'),
+            defeated_enemies=Count('enemies', filter=Q(enemies__is_defeated=True)),
+        )
+        .order_by('id')
+    )
+    return {'quests': [quest_state(quest) for quest in quests]}
+
+
+hero = _state_view(_hero)
+enemy = _state_view(_enemy)
+quests = _state_view(_quests)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class GameConfig(AppConfig):
     name = 'game'
+
+    def ready(self):
+        # Connects the page cache invalidation and query counting receivers
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,131 @@
+# Coroutine versions of the views that wait on the AI service.
+# core/asgi.py switches these on (see game/urls.py): while a view is waiting
+# for the model the worker can keep serving other players, instead of one
+# thread being parked for up to 90 seconds per generation.
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.utils import timezone
+
+from . import admission, ai_service, content_pack, idempotency, page_cache, quest_board, shop, spawns
+from .bands import level_band
+from .models import Character, Enemy, Quest
+
+logger = logging.getLogger(__name__)
+
+
+@admission.rate_limited
+async def refresh_quests(request, char_id):
+    hero = await aget_object_or_404(Character, pk=char_id)
+    band = level_band(hero.level)
+
+    # Only ever touch this hero's band - other players' boards stay untouched
+    await sync_to_async(quest_board.refresh)(band)
+    quest_board.schedule_top_up(band)
+
+    return redirect('quest_log', char_id=hero.id)
+
+
+async def _quest_enemy(hero, quest):
+    # The content pack answers instantly, the AI is only asked without one
+    return content_pack.enemy(hero.level) or await ai_service.agenerate_enemy(
+        fallback=True, player_level=hero.level, context=f"Quest: {quest.title}"
+    )
+
+
+@idempotency.idempotent
+@admission.rate_limited
+async def assign_quest(request, char_id, quest_id):
+    hero = await aget_object_or_404(Character, pk=char_id)
+    quest = await aget_object_or_404(Quest, pk=quest_id)
+
+    if request.method != "POST":
+        return redirect('quest_log', char_id=hero.id)
+
+    # The pool is shared by the whole band, so only claim the quest if nobody beat us to it
+    claimed = await Quest.objects.filter(pk=quest.id, assigned_to__isnull=True).aupdate(assigned_to=hero, updated_at=timezone.now())
+    if not claimed:
+        messages.error(request, "That quest has already been taken.")
+        return redirect('quest_log', char_id=hero.id)
+    quest.assigned_to = hero
+
+    # update() skips the signals, so invalidate the cached pages by hand
+    page_cache.bump_hero(hero.id)
+    page_cache.bump_band(quest.level_band)
+
+    # Replace the claimed quest in the background
+    quest_board.schedule_top_up(quest.level_band)
+
+    # All 3 enemies are generated at the same time instead of one after another
+    results = await asyncio.gather(*(_quest_enemy(hero, quest) for _ in range(3)), return_exceptions=True)
+    for data in results:
+        if isinstance(data, Exception):
+            logger.warning("Failed to generate quest enemy: %s", data)
+            continue
+        await Enemy.objects.acreate(
+            name=data['name'],
+            health=data['health'],
+            attack_power=data['attack_power'],
+            xp_reward=data['xp_reward'],
+            quest=quest
+        )
+
+    return redirect('quest_detail', char_id=hero.id, quest_id=quest.id)
+
+
+@idempotency.idempotent
+@admission.rate_limited
+async def generate_new_enemy(request, char_id):
+    if request.method != "POST":
+        return redirect('character_detail', char_id=char_id)
+
+    hero = await aget_object_or_404(Character.objects.select_related('current_location'), pk=char_id)
+    location = hero.current_location
+
+    try:
+        # The location's spawn table first, then the content pack, then the AI
+        data = (
+            await sync_to_async(spawns.spawn)(hero.current_location_id, hero.level, hero.max_health, hero.strength)
+            or content_pack.enemy(hero.level, hero.max_health, hero.strength)
+            or await ai_service.agenerate_enemy(
+                fallback=True,
+                player_level=hero.level,
+                environment=location.name if location else "Arena",
+                player_health=hero.max_health,
+                player_strength=hero.strength
+            )
+        )
+        new_enemy = await Enemy.objects.acreate(
+            name=data['name'],
+            level=data['level'],
+            health=data['health'],
+            attack_power=data['attack_power'],
+            xp_reward=data['xp_reward'],
+            location=location
+        )
+        return redirect('battle_arena', char_id=hero.id, enemy_id=new_enemy.id)
+
+    except Exception:
+        logger.exception("Could not start a battle for hero %s", char_id)
+        return redirect('character_detail', char_id=char_id)
+
+
+async def shop_page(request, char_id):
+    hero = await aget_object_or_404(Character, pk=char_id)
+    band = level_band(hero.level)
+
+    # Every level band has its own pre-generated shelf
+    shop_items = [item async for item in shop.band_stock(band)]
+
+    if not shop_items:
+        shop_items = await sync_to_async(shop.stock_empty_band)(band)
+    elif shop.is_stale(shop_items):
+        shop.schedule_rotation(band)
+
+    return render(request, 'game/shop_page.html', {
+        'hero': hero,
+        'shop_items': shop_items
+    })
@@ -0,0 +1,25 @@
+from django.conf import settings
+
+
+# ===== LEVEL BANDS =====
+# Content (shop stock, quest boards, ...) is shared by every hero inside the
+# same band instead of being generated for one exact level.
+
+def level_band(level):
+    return max(level - 1, 0) // settings.LEVEL_BAND_SIZE
+
+
+def band_levels(band):
+    # (lowest level, highest level) covered by the band
+    low = band * settings.LEVEL_BAND_SIZE + 1
+    return low, low + settings.LEVEL_BAND_SIZE - 1
+
+
+def band_reference_level(band):
+    # The level we generate content for - the middle of the band
+    low, high = band_levels(band)
+    return (low + high) // 2
+
+
+def all_bands():
+    return range(level_band(settings.MAX_PREGENERATED_LEVEL) + 1)
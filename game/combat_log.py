@@ -0,0 +1,146 @@
+# ===== COMBAT LOG =====
+# Append-only history of every combat turn (CombatEvent), for replaying
+# fights and for analytics.
+#
+# attack_enemy only appends to an in-memory buffer. The buffer is written
+# behind the request in one multi-row INSERT once it holds
+# COMBAT_LOG_BATCH_SIZE events or its oldest event is COMBAT_LOG_FLUSH_SECONDS
+# old, so a combat turn never waits for the log. A timer armed with the first
+# buffered event makes sure the last few events of a quiet server get written
+# too. The price: events still in the buffer are lost if the process dies.
+#
+# The table is partitioned by day through CombatLogPartition (the first event
+# id of each day); prune() drops whole days by primary key range.
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .models import CombatEvent, CombatLogPartition
+from .tasks import submit_once
+
+logger = logging.getLogger(__name__)
+
+Kind = CombatEvent.Kind
+
+SECONDS_PER_DAY = 24 * 60 * 60
+PRUNE_CHUNK = 10000
+
+_buffer = []
+_oldest = None
+_lock = threading.Lock()
+# Days this process already made sure have a partition row
+_partitions = set()
+
+
+def record(kind, character_id, enemy_id=None, value=0):
+    """Append one event to the buffer - no database work in the caller."""
+    global _oldest
+    now = time.time()
+    with _lock:
+        _buffer.append((int(now), kind, character_id, enemy_id, int(value)))
+        if _oldest is None:
+            _oldest = now
+            _arm_timer()
+        due = len(_buffer) >= settings.COMBAT_LOG_BATCH_SIZE or now - _oldest >= settings.COMBAT_LOG_FLUSH_SECONDS
+    if due:
+        submit_once("combat-log-flush", flush)
+
+
+def _arm_timer():
+    # Only call with _lock held, when the buffer gets its oldest event.
+    # One timer per batch: a leftover timer of an earlier batch only flushes early.
+    # Inline tasks (tests) run in the caller, and there is no caller to run the timer's flush in.
+    if settings.BACKGROUND_TASKS_INLINE:
+        return
+    timer = threading.Timer(settings.COMBAT_LOG_FLUSH_SECONDS, submit_once, ("combat-log-flush", flush))
+    timer.daemon = True
+    timer.start()
+
+
+def flush():
+    """Write the buffered events in one INSERT, return how many were written."""
+    global _oldest
+    with _lock:
+        batch = list(_buffer)
+        _buffer.clear()
+        _oldest = None
+    if not batch:
+        return 0
+
+    try:
+        events = CombatEvent.objects.bulk_create([
+            CombatEvent(at=at, kind=kind, character_id=character_id, enemy_id=enemy_id, value=value)
+            for at, kind, character_id, enemy_id, value in batch
+        ])
+    except Exception:
+        logger.exception("Could not write %d combat events", len(batch))
+        with _lock:
+            # Try again with the next batch, unless the database has been gone for a while
+            if len(_buffer) < settings.COMBAT_LOG_BATCH_SIZE * 10:
+                _buffer[:0] = batch
+                if _oldest is None:
+                    _oldest = time.time()
+                    _arm_timer()
+        return 0
+
+    _mark_partitions(events)
+    return len(events)
+
+
+def _mark_partitions(events):
+    first_ids = {}
+    for event in events:
+        day = event.at // SECONDS_PER_DAY
+        if day not in _partitions and event.pk is not None:
+            first_ids[day] = min(first_ids.get(day, event.pk), event.pk)
+
+    for day, first_id in first_ids.items():
+        CombatLogPartition.objects.bulk_create([CombatLogPartition(day=day, first_event_id=first_id)], ignore_conflicts=True)
+        # Another process may have started the day with a later batch
+        CombatLogPartition.objects.filter(day=day, first_event_id__gt=first_id).update(first_event_id=first_id)
+        _partitions.add(day)
+
+
+def prune(keep_days=None):
+    """Delete the events of every day older than keep_days, return how many were deleted."""
+    keep_days = keep_days or settings.COMBAT_LOG_RETENTION_DAYS
+    cutoff_day = int(time.time()) // SECONDS_PER_DAY - keep_days + 1
+
+    # Every day with events has a partition, so no kept partition means nothing is kept
+    first_kept = (
+        CombatLogPartition.objects.filter(day__gte=cutoff_day)
+        .order_by('day').values_list('first_event_id', flat=True).first()
+    )
+    old = CombatEvent.objects.all() if first_kept is None else CombatEvent.objects.filter(pk__lt=first_kept)
+    lowest = old.order_by('pk').values_list('pk', flat=True).first()
+    highest = old.order_by('-pk').values_list('pk', flat=True).first()
+
+    deleted = 0
+    # Chunks, so other writers get the database in between
+    while lowest is not None and lowest <= highest:
+        count, _ = CombatEvent.objects.filter(pk__gte=lowest, pk__lt=lowest + PRUNE_CHUNK, pk__lte=highest).delete()
+        deleted += count
+        lowest += PRUNE_CHUNK
+
+    CombatLogPartition.objects.filter(day__lt=cutoff_day).delete()
+    _partitions.difference_update({day for day in _partitions if day < cutoff_day})
+    return deleted
+
+
+def replay(character_id, enemy_id=None, since=None):
+    """A hero's events in the order they happened (one fight with enemy_id)."""
+    # This process' own events should not be missing from its own replay
+    flush()
+    events = CombatEvent.objects.filter(character_id=character_id)
+    if since is not None:
+        events = events.filter(at__gte=int(since))
+    if enemy_id is not None:
+        events = events.filter(enemy_id=enemy_id)
+    return list(events.order_by('pk'))
+
+
+# Don't drop the last few seconds of events on a clean shutdown
+atexit.register(flush)
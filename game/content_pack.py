@@ -0,0 +1,162 @@
+# ===== CONTENT PACK =====
+# A read-only SQLite file full of pre-generated enemies, quests and shop items,
+# built off-peak by the build_content_pack command. When it exists the live
+# path draws from it instead of waiting for the AI service.
+#
+# The file is opened immutable and memory-mapped, every record sits under a
+# (kind, band, seq) primary key and the record counts are kept in memory, so
+# a random draw is one B-tree lookup in mapped pages - a few microseconds.
+# Rebuilding replaces the file atomically; readers notice within
+# RECHECK_SECONDS and reopen it.
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+from . import procedural
+from .bands import level_band
+
+logger = logging.getLogger(__name__)
+
+ENEMY = 'enemy'
+QUEST = 'quest'
+ITEM = 'item'
+
+RECHECK_SECONDS = 30
+MMAP_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE records (
+    kind TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, band, seq)
+) WITHOUT ROWID;
+CREATE TABLE counts (
+    kind TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (kind, band)
+) WITHOUT ROWID;
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+
+# ===== WRITING =====
+def write(path, records, meta=None):
+    """Write {(kind, band): [record, ...]} to a new pack at path, replacing any old one."""
+    tmp_path = f"{path}.building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(SCHEMA)
+        for (kind, band), rows in records.items():
+            db.executemany(
+                "INSERT INTO records (kind, band, seq, data) VALUES (?, ?, ?, ?)",
+                ((kind, band, seq, json.dumps(row, separators=(',', ':'))) for seq, row in enumerate(rows)),
+            )
+            db.execute("INSERT INTO counts (kind, band, n) VALUES (?, ?, ?)", (kind, band, len(rows)))
+        db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", (meta or {}).items())
+        db.commit()
+        # Compact: the file is never written to again
+        db.execute("VACUUM")
+    finally:
+        db.close()
+
+    # Readers keep the old file until they reopen
+    os.replace(tmp_path, path)
+
+
+# ===== READING =====
+class Pack:
+    def __init__(self, path):
+        self.path = str(path)
+        self.mtime = os.stat(self.path).st_mtime
+        self.local = threading.local()
+        db = self.connection()
+        self.counts = {(kind, band): n for kind, band, n in db.execute("SELECT kind, band, n FROM counts")}
+        self.meta = dict(db.execute("SELECT key, value FROM meta"))
+
+    def connection(self):
+        # sqlite3 connections belong to one thread
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            db.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+            self.local.db = db
+        return db
+
+    def draw(self, kind, band, count=1):
+        n = self.counts.get((kind, band), 0)
+        if not n:
+            return []
+        db = self.connection()
+        # No repeats unless more records are asked for than the band has
+        seqs = random.sample(range(n), count) if count <= n else [random.randrange(n) for _ in range(count)]
+        rows = []
+        for seq in seqs:
+            (data,) = db.execute("SELECT data FROM records WHERE kind = ? AND band = ? AND seq = ?", (kind, band, seq)).fetchone()
+            rows.append(json.loads(data))
+        return rows
+
+
+_pack = None
+_checked_at = float('-inf')
+_lock = threading.Lock()
+
+
+def current():
+    """The pack at CONTENT_PACK_PATH, or None when there is none."""
+    global _pack, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < RECHECK_SECONDS:
+        return _pack
+
+    with _lock:
+        if now - _checked_at < RECHECK_SECONDS:
+            return _pack
+        _checked_at = now
+        path = settings.CONTENT_PACK_PATH
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            _pack = None
+            return None
+        if _pack is None or _pack.path != str(path) or _pack.mtime != mtime:
+            try:
+                _pack = Pack(path)
+            except sqlite3.Error as e:
+                logger.warning("Could not open content pack %s: %s", path, e)
+                _pack = None
+    return _pack
+
+
+def refresh():
+    """Look at CONTENT_PACK_PATH again on the next draw instead of within RECHECK_SECONDS."""
+    global _checked_at
+    _checked_at = float('-inf')
+
+
+def draw(kind, band, count=1):
+    """count random records for the band - [] without a pack."""
+    pack = current()
+    return pack.draw(kind, band, count) if pack else []
+
+
+def enemy(level, player_health=100, player_strength=50):
+    """An enemy named from the pack, with stats rolled for this hero (None without a pack)."""
+    drawn = draw(ENEMY, level_band(level))
+    if not drawn:
+        return None
+    # Same stat ranges the AI service is told to use, so fights stay balanced
+    data = procedural.enemy(level, player_health, player_strength)
+    data['name'] = drawn[0]['name']
+    return data
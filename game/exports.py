@@ -0,0 +1,131 @@
+# ===== EXPORTS =====
+# Streaming dumps of the game tables for analytics, as NDJSON or CSV.
+#
+# Rows are read in primary key order, CHUNK_SIZE at a time, each chunk its
+# own short query starting after the last id of the previous one. Nothing
+# holds the whole table in memory and no read transaction stays open while
+# the client downloads. Each chunk is serialized and handed on before the
+# next one is fetched.
+import csv
+from datetime import datetime, time
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .bands import level_band
+from .models import Character, Enemy, Item, Quest
+
+CHUNK_SIZE = 2000
+
+# name: (model, exported fields, field the level filter applies to)
+EXPORTS = {
+    'characters': (
+        Character,
+        ['id', 'name', 'level', 'xp', 'health', 'max_health', 'strength', 'gold_amount', 'current_location_id', 'updated_at'],
+        'level',
+    ),
+    'quests': (
+        Quest,
+        ['id', 'title', 'xp_reward', 'is_completed', 'level_band', 'assigned_to_id', 'updated_at'],
+        'level_band',
+    ),
+    'items': (
+        Item,
+        ['id', 'name', 'item_type', 'health_bonus', 'power_bonus', 'price', 'is_in_shop', 'is_equipped',
+         'level_band', 'owner_id', 'updated_at'],
+        'level_band',
+    ),
+    'enemies': (
+        Enemy,
+        ['id', 'name', 'level', 'health', 'attack_power', 'xp_reward', 'is_defeated', 'quest_id', 'location_id', 'updated_at'],
+        'level',
+    ),
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_filters(since=None, min_level=None, max_level=None):
+    """Turn the text filters of a request or command line into queryset() arguments.
+
+    Raises ValueError for anything unreadable."""
+    filters = {}
+    if since:
+        moment = parse_datetime(since)
+        if moment is None:
+            day = parse_date(since)
+            if day is None:
+                raise ValueError(f"since must be an ISO date or datetime, not {since!r}")
+            moment = datetime.combine(day, time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        filters['since'] = moment
+    if min_level not in (None, ''):
+        filters['min_level'] = int(min_level)
+    if max_level not in (None, ''):
+        filters['max_level'] = int(max_level)
+    return filters
+
+
+def queryset(name, since=None, min_level=None, max_level=None):
+    model, fields, level_field = EXPORTS[name]
+    rows = model.objects.all()
+    if since is not None:
+        rows = rows.filter(updated_at__gte=since)
+
+    # Quests and items only know their level band
+    to_field = level_band if level_field == 'level_band' else int
+    if min_level is not None:
+        rows = rows.filter(**{f"{level_field}__gte": to_field(min_level)})
+    if max_level is not None:
+        rows = rows.filter(**{f"{level_field}__lte": to_field(max_level)})
+    return rows
+
+
+def chunks(name, **filters):
+    """Lists of value tuples in primary key order, CHUNK_SIZE rows per query."""
+    fields = EXPORTS[name][1]
+    rows = queryset(name, **filters).order_by('pk').values_list(*fields)
+    last_id = None
+    while True:
+        chunk = list((rows if last_id is None else rows.filter(pk__gt=last_id))[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        # id is always the first field
+        last_id = chunk[-1][0]
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def ndjson(name, **filters):
+    fields = EXPORTS[name][1]
+    for chunk in chunks(name, **filters):
+        yield "".join(
+            json.dumps(dict(zip(fields, map(_value, row))), separators=(',', ':')) + "\n"
+            for row in chunk
+        )
+
+
+class _Echo:
+    # csv.writer wants a file; this one hands the line straight back
+    def write(self, value):
+        return value
+
+
+def csv_rows(name, **filters):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORTS[name][1])
+    for chunk in chunks(name, **filters):
+        yield "".join(writer.writerow([_value(value) for value in row]) for row in chunk)
+
+
+def stream(name, format, **filters):
+    """Generator of text blocks for the export in the given format."""
+    return ndjson(name, **filters) if format == 'ndjson' else csv_rows(name, **filters)
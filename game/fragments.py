@@ -0,0 +1,40 @@
+# ===== FRAGMENT RESPONSES =====
+# attack_enemy, equip_item and unequip_item answer a plain form POST with a
+# redirect to the full page. static/game/js/fragments.js sends the same POST
+# with an X-Fragments header and gets back only the pieces of the page that
+# changed (HP bars, the gear slot, the bag, the message), each with the id of
+# the element it replaces. A client that asks for application/json gets the
+# new state as compact JSON instead.
+#
+# When the whole page changes (victory, defeat) there is nothing to patch:
+# fragments get an empty answer with an X-Redirect header and JSON a
+# "redirect" field, since a fetch can't see where a redirect pointed.
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import render
+
+FRAGMENTS = 'fragments'
+JSON = 'json'
+
+
+def wanted(request):
+    """FRAGMENTS, JSON or None for the full-page redirect."""
+    accept = request.headers.get('Accept', '')
+    if accept.split(',')[0].strip() == 'application/json':
+        return JSON
+    if request.headers.get('X-Fragments'):
+        return FRAGMENTS
+    return None
+
+
+def respond(request, template, context, data, location=None):
+    """The fragment or JSON answer to an action, location when the page changes.
+
+    Only call this when wanted(request) is not None."""
+    if wanted(request) == JSON:
+        return JsonResponse({**data, 'redirect': location})
+    if location:
+        response = HttpResponse(status=204)
+        response['X-Redirect'] = location
+        return response
+    return render(request, template, context)
+
@@ -0,0 +1,141 @@
+# ===== IDEMPOTENT POSTS =====
+# The forms that spend gold or start AI generations carry a one-off
+# idempotency key ({% idempotency_key %} from the game_forms tag library).
+# The first POST with a key claims it in the cache and runs the view; its
+# redirect is remembered for IDEMPOTENCY_TTL_SECONDS. A double click, a
+# browser resubmit or a retry after a timeout sends the same key again and
+# gets the same redirect back without running the view a second time.
+#
+# A repeat that arrives while the first POST is still running waits up to
+# IDEMPOTENCY_WAIT_SECONDS for it to finish under ASGI, where waiting costs
+# nothing but a coroutine. A sync view would hold a whole worker meanwhile, so
+# there the wait is IDEMPOTENCY_SYNC_WAIT_SECONDS (by default none: the repeat
+# gets the 409 busy page at once). Responses that are not redirects
+# (errors, the busy page) are not remembered, so those may be retried.
+# POSTs without a key behave as before.
+import asyncio
+import functools
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponseRedirect
+from django.shortcuts import render
+
+FIELD = 'idempotency_key'
+IN_PROGRESS = 'running'
+POLL_SECONDS = 0.1
+
+# Keys are uuid4 hex strings - anything else is ignored
+_valid_key = re.compile(r'^[0-9a-f]{32}$')
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def _cache():
+    return caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+
+
+def _cache_key(request):
+    """Cache key for the POSTed idempotency key, None without a usable one."""
+    if request.method != "POST":
+        return None
+    key = request.POST.get(FIELD, '')
+    if not _valid_key.match(key):
+        return None
+    # The same key sent to another view (or another hero) is another action
+    match = request.resolver_match
+    target = ":".join(str(value) for value in match.kwargs.values())
+    return f"game:idem:{match.url_name}:{target}:{key}"
+
+
+def _result(response):
+    if 300 <= response.status_code < 400:
+        return (response.status_code, response['Location'])
+    return None
+
+
+def _replay(result):
+    status, location = result
+    response = HttpResponseRedirect(location)
+    response.status_code = status
+    return response
+
+
+def _still_running(request, wait):
+    response = render(request, 'game/busy.html', {
+        'char_id': request.resolver_match.kwargs.get('char_id'),
+        'message': "Your last request is still being handled, try again in a moment.",
+    }, status=409)
+    response['Retry-After'] = str(max(1, round(wait)))
+    return response
+
+
+def idempotent(view):
+    """Run a POST view (sync or async) once per idempotency key. Goes outermost."""
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            cache_key = _cache_key(request)
+            if cache_key is None:
+                return await view(request, *args, **kwargs)
+
+            cache = _cache()
+            wait = settings.IDEMPOTENCY_WAIT_SECONDS
+            deadline = time.monotonic() + wait
+            while not await cache.aadd(cache_key, IN_PROGRESS, settings.IDEMPOTENCY_TTL_SECONDS):
+                result = await cache.aget(cache_key)
+                if result not in (None, IN_PROGRESS):
+                    return _replay(result)
+                if time.monotonic() >= deadline:
+                    return _still_running(request, wait)
+                await asyncio.sleep(POLL_SECONDS)
+
+            try:
+                response = await view(request, *args, **kwargs)
+            except BaseException:
+                await cache.adelete(cache_key)
+                raise
+            result = _result(response)
+            if result is None:
+                await cache.adelete(cache_key)
+            else:
+                await cache.aset(cache_key, result, settings.IDEMPOTENCY_TTL_SECONDS)
+            return response
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        cache_key = _cache_key(request)
+        if cache_key is None:
+            return view(request, *args, **kwargs)
+
+        cache = _cache()
+        wait = settings.IDEMPOTENCY_SYNC_WAIT_SECONDS
+        deadline = time.monotonic() + wait
+        # add() only succeeds for the first request with this key
+        while not cache.add(cache_key, IN_PROGRESS, settings.IDEMPOTENCY_TTL_SECONDS):
+            result = cache.get(cache_key)
+            if result not in (None, IN_PROGRESS):
+                return _replay(result)
+            if time.monotonic() >= deadline:
+                return _still_running(request, wait)
+            time.sleep(POLL_SECONDS)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            # Let the player try again
+            cache.delete(cache_key)
+            raise
+        result = _result(response)
+        if result is None:
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, result, settings.IDEMPOTENCY_TTL_SECONDS)
+        return response
+    return wrapper
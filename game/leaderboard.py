@@ -0,0 +1,101 @@
+# ===== LEADERBOARD =====
+# Heroes are ranked by level, then xp, then character id (older heroes win ties).
+#
+# Instead of sorting every hero on each request, LeaderboardEntry stores each
+# hero's rank and we only shift the ranks of the heroes a change actually
+# overtakes. Every read is a range scan on the rank index.
+from django.db import transaction
+from django.db.models import F, Max, Q
+
+from .models import Character, LeaderboardEntry
+
+
+def _ranked_above(level, xp, char_id):
+    # Q matching every entry that ranks above the given (level, xp, id)
+    return (
+        Q(level__gt=level)
+        | Q(level=level, xp__gt=xp)
+        | Q(level=level, xp=xp, character_id__lt=char_id)
+    )
+
+
+def _last_rank():
+    return LeaderboardEntry.objects.aggregate(last=Max('rank'))['last'] or 0
+
+
+def record(hero):
+    """Insert or move the hero's entry after their level/xp changed."""
+    with transaction.atomic():
+        entry = LeaderboardEntry.objects.select_for_update().filter(character_id=hero.id).first()
+
+        if entry is None:
+            # New heroes start at the bottom and climb from there like everyone else
+            entry = LeaderboardEntry(character=hero, rank=_last_rank() + 1)
+        elif (entry.level, entry.xp) == (hero.level, hero.xp):
+            return entry
+
+        entry.level = hero.level
+        entry.xp = hero.xp
+        entry.save()
+        _move(entry)
+        return entry
+
+
+def _move(entry):
+    old_rank = entry.rank
+    above = _ranked_above(entry.level, entry.xp, entry.character_id)
+    others = LeaderboardEntry.objects.exclude(pk=entry.pk)
+
+    # Walk up from the old rank until we meet someone still ranked above us
+    blocker = others.filter(above, rank__lt=old_rank).order_by('-rank').first()
+    new_rank = blocker.rank + 1 if blocker else 1
+
+    if new_rank < old_rank:
+        # Moved up - everyone we overtook drops one place
+        others.filter(rank__gte=new_rank, rank__lt=old_rank).update(rank=F('rank') + 1)
+    else:
+        # Didn't overtake anyone - maybe we dropped down instead
+        passed_by = others.exclude(above).filter(rank__gt=old_rank).order_by('rank').first()
+        new_rank = passed_by.rank - 1 if passed_by else _last_rank()
+        others.filter(rank__gt=old_rank, rank__lte=new_rank).update(rank=F('rank') - 1)
+
+    if new_rank != old_rank:
+        entry.rank = new_rank
+        entry.save(update_fields=['rank'])
+
+
+def remove(rank):
+    """Close the gap a deleted entry left behind."""
+    LeaderboardEntry.objects.filter(rank__gt=rank).update(rank=F('rank') - 1)
+
+
+def top(count=10):
+    return LeaderboardEntry.objects.filter(rank__lte=count).order_by('rank').select_related('character')
+
+
+def around(char_id, neighbours=3):
+    """The hero's entry with the given number of neighbours on each side."""
+    entry = LeaderboardEntry.objects.filter(character_id=char_id).first()
+    if entry is None:
+        return LeaderboardEntry.objects.none()
+    return (
+        LeaderboardEntry.objects
+        .filter(rank__gte=entry.rank - neighbours, rank__lte=entry.rank + neighbours)
+        .order_by('rank')
+        .select_related('character')
+    )
+
+
+def rebuild():
+    """Recompute every rank from the Character table from scratch."""
+    heroes = Character.objects.order_by('-level', '-xp', 'id').values_list('id', 'level', 'xp')
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(
+            (
+                LeaderboardEntry(character_id=char_id, level=level, xp=xp, rank=rank)
+                for rank, (char_id, level, xp) in enumerate(heroes.iterator(), start=1)
+            ),
+            batch_size=1000,
+        )
+    return LeaderboardEntry.objects.count()
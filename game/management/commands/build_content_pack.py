@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from game import ai_service, content_pack, procedural
+from game.bands import all_bands, band_reference_level
+
+
+def _enemies(level, count, use_ai):
+    if not use_ai:
+        return [procedural.enemy(level) for _ in range(count)]
+    return [ai_service.generate_enemy(fallback=True, player_level=level) for _ in range(count)]
+
+
+def _batches(generate, formula, level, count, use_ai):
+    # The AI hands out 3 quests / items per call
+    records = []
+    while use_ai and len(records) < count:
+        try:
+            batch = generate(level)
+        except Exception as e:
+            print(f"Generation for level {level} failed, using the formulas: {e}")
+            break
+        if not batch:
+            break
+        records.extend(batch)
+    records = records[:count]
+    return records + formula(level, count - len(records))
+
+
+class Command(BaseCommand):
+    help = "Pre-generate enemies, quests and shop items for every level band into a read-only content pack. Run it off-peak."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.CONTENT_PACK_PATH, help="Where to write the pack (default: CONTENT_PACK_PATH)")
+        parser.add_argument('--enemies', type=int, default=200, help="Enemies per band")
+        parser.add_argument('--quests', type=int, default=60, help="Quests per band")
+        parser.add_argument('--items', type=int, default=60, help="Shop items per band")
+        parser.add_argument('--workers', type=int, default=4, help="Bands generated at the same time")
+        parser.add_argument('--no-ai', action='store_true', help="Use the procedural formulas instead of the AI service")
+
+    def handle(self, *args, **options):
+        use_ai = not options['no_ai']
+        started = time.monotonic()
+
+        def build_band(band):
+            level = band_reference_level(band)
+            return band, {
+                content_pack.ENEMY: _enemies(level, options['enemies'], use_ai),
+                content_pack.QUEST: _batches(ai_service.generate_quests, procedural.quests, level, options['quests'], use_ai),
+                content_pack.ITEM: _batches(ai_service.generate_shop_items, procedural.shop_items, level, options['items'], use_ai),
+            }
+
+        records = {}
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for band, kinds in pool.map(build_band, all_bands()):
+                for kind, rows in kinds.items():
+                    records[(kind, band)] = rows
+                self.stdout.write(f"Band {band}: " + ", ".join(f"{len(rows)} {kind}s" for kind, rows in kinds.items()))
+
+        content_pack.write(options['output'], records, meta={
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'source': 'ai' if use_ai else 'procedural',
+        })
+
+        total = sum(len(rows) for rows in records.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {total} records to {options['output']} in {time.monotonic() - started:.1f}s."
+        ))
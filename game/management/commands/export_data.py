@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game import exports
+
+
+class Command(BaseCommand):
+    help = "Stream a game table as NDJSON or CSV, for analytics. Memory use stays flat however big the table is."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='ndjson')
+        parser.add_argument('--since', help="Only rows changed since this ISO date or datetime")
+        parser.add_argument('--min-level', type=int)
+        parser.add_argument('--max-level', type=int)
+        parser.add_argument('--output', help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            filters = exports.parse_filters(options['since'], options['min_level'], options['max_level'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        out = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for block in exports.stream(options['name'], options['format'], **filters):
+                out.write(block)
+        finally:
+            if options['output']:
+                out.close()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from game import quest_board
+from game.bands import all_bands, band_levels
+
+
+class Command(BaseCommand):
+    help = "Top up the unassigned quest pool of every level band to QUEST_POOL_DEPTH."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--band', type=int, action='append', help="Only fill these bands (repeatable)")
+        parser.add_argument('--no-ai', action='store_true', help="Use the procedural formulas instead of the AI service")
+
+    def handle(self, *args, **options):
+        bands = options['band'] or all_bands()
+        use_ai = not options['no_ai']
+
+        for band in bands:
+            created = quest_board.top_up(band, use_ai=use_ai)
+            low, high = band_levels(band)
+            self.stdout.write(f"Band {band} (levels {low}-{high}): {len(created)} quests written")
+
+        self.stdout.write(self.style.SUCCESS("Quest boards filled."))
@@ -0,0 +1,64 @@
+import gzip
+import re
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from game.models import Character, Enemy
+
+STYLESHEET = re.compile(r'<link rel="stylesheet" href="([^"]+)">')
+INLINE_STYLE = re.compile(r'<style>.*?</style>', re.DOTALL)
+
+
+class Command(BaseCommand):
+    help = "Measure how many bytes one battle turn (attack POST + arena GET) sends to the browser."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--turns', type=int, default=5)
+
+    def handle(self, *args, **options):
+        turns = options['turns']
+        client = Client(HTTP_HOST='localhost')
+
+        # Fight a throwaway hero against a throwaway enemy and roll everything back
+        with transaction.atomic():
+            hero = Character.objects.create(name="Bytes Counter", health=10_000, max_health=10_000, strength=1)
+            enemy = Enemy.objects.create(name="Training Dummy", health=10_000, attack_power=1)
+            hero.current_enemy = enemy
+            hero.save()
+
+            html_bytes = 0
+            html_gzip_bytes = 0
+            inline_css_bytes = 0
+            stylesheets = set()
+
+            for _ in range(turns):
+                attack = client.post(reverse('attack_enemy', args=[hero.id]))
+                page = client.get(attack['Location'])
+                html = page.content
+
+                html_bytes += len(attack.content) + len(html)
+                html_gzip_bytes += len(gzip.compress(attack.content)) + len(gzip.compress(html))
+                text = html.decode()
+                inline_css_bytes += sum(len(block) for block in INLINE_STYLE.findall(text))
+                stylesheets.update(STYLESHEET.findall(text))
+
+            transaction.set_rollback(True)
+
+        css_bytes = 0
+        css_gzip_bytes = 0
+        for url in sorted(stylesheets):
+            path = finders.find(url.split('/static/', 1)[-1])
+            with open(path, 'rb') as f:
+                content = f.read()
+            css_bytes += len(content)
+            css_gzip_bytes += len(gzip.compress(content))
+
+        self.stdout.write(f"Turns measured:            {turns}")
+        self.stdout.write(f"HTML per turn:             {html_bytes // turns} B ({html_gzip_bytes // turns} B gzipped)")
+        self.stdout.write(f"Inline CSS per turn:       {inline_css_bytes // turns} B")
+        self.stdout.write(f"Linked stylesheets:        {len(stylesheets)} files, {css_bytes} B ({css_gzip_bytes} B gzipped)")
+        self.stdout.write("                           sent once, then served from the browser cache")
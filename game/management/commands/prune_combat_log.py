@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from game import combat_log
+
+
+class Command(BaseCommand):
+    help = "Delete combat events older than the retention period, a whole day at a time. Run it daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.COMBAT_LOG_RETENTION_DAYS, help="Days of events to keep (default: COMBAT_LOG_RETENTION_DAYS)")
+
+    def handle(self, *args, **options):
+        deleted = combat_log.prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} combat events older than {options['days']} days."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from game import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recompute every leaderboard rank from the Character table (e.g. after manual DB edits)."
+
+    def handle(self, *args, **options):
+        count = leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Leaderboard rebuilt with {count} heroes."))
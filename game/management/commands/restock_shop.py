@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from game import shop
+from game.bands import all_bands, band_levels
+
+
+class Command(BaseCommand):
+    help = "Pre-generate shop stock for every level band and rotate out old unsold items. Run it from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--band', type=int, action='append', help="Only restock these bands (repeatable)")
+        parser.add_argument('--no-ai', action='store_true', help="Use the procedural formulas instead of the AI service")
+
+    def handle(self, *args, **options):
+        bands = options['band'] or all_bands()
+        use_ai = not options['no_ai']
+
+        for band in bands:
+            deleted = shop.rotate_band(band, use_ai=use_ai)
+            low, high = band_levels(band)
+            self.stdout.write(f"Band {band} (levels {low}-{high}): {shop.band_stock(band).count()} items on sale, {deleted} old items removed")
+
+        self.stdout.write(self.style.SUCCESS("Shop restocked."))
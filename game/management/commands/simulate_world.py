@@ -0,0 +1,235 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+
+from game import combat_log, content_pack, procedural, quest_board, shop
+from game.bands import all_bands, band_reference_level, level_band
+from game.metrics import QueryCounter
+from game.models import Character, Enemy
+
+# Tables that grow with play
+TRACKED_TABLES = [
+    'game_enemy', 'game_item', 'game_quest', 'game_character', 'game_leaderboardentry', 'game_combatevent', 'django_session',
+]
+
+MAX_ATTACKS = 60
+
+
+class Action:
+    def __init__(self):
+        self.count = 0
+        self.queries = 0
+        self.cpu = 0.0
+        self.errors = 0
+
+    def add(self, queries, cpu, status):
+        self.count += 1
+        self.queries += queries
+        self.cpu += cpu
+        self.errors += status >= 500
+
+
+class Simulation:
+    """Plays heroes through the real views with Django's test client."""
+
+    def __init__(self):
+        self.actions = {}
+        # A crashing view is counted as an error instead of ending the run
+        self.client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+
+    def request(self, method, path, data=None):
+        counter = QueryCounter()
+        started = time.thread_time()
+        with connection.execute_wrapper(counter):
+            response = getattr(self.client, method)(path, data or {})
+        cpu = time.thread_time() - started
+        self.actions.setdefault(resolve(path).url_name, Action()).add(counter.count, cpu, response.status_code)
+
+        # The browser follows the redirect, so the simulation does too
+        if response.status_code in (301, 302):
+            return self.request('get', response['Location'])
+        return response
+
+    def fight(self, hero, enemy_id):
+        # Same way in as the quest page's Fight button
+        self.request('get', reverse('battle_arena', args=[hero.id, enemy_id]))
+        for _ in range(MAX_ATTACKS):
+            self.request('post', reverse('attack_enemy', args=[hero.id]))
+            hero.refresh_from_db(fields=['health', 'current_enemy'])
+            if hero.current_enemy_id is None:
+                break
+        if hero.health <= 0:
+            self.request('get', reverse('rest', args=[hero.id]))
+
+    def play_quest(self, hero):
+        self.request('get', reverse('quest_log', args=[hero.id]))
+        quest_id = quest_board.band_pool(level_band(hero.level)).values_list('id', flat=True).first()
+        if quest_id is None:
+            self.request('get', reverse('refresh_quests', args=[hero.id]))
+            return
+
+        self.request('post', reverse('assign_quest', args=[hero.id, quest_id]))
+        for enemy_id in Enemy.objects.filter(quest_id=quest_id, is_defeated=False).values_list('id', flat=True):
+            # A lost fight leaves the enemy standing - try again once rested
+            for _ in range(3):
+                self.fight(hero, enemy_id)
+                if Enemy.objects.filter(pk=enemy_id, is_defeated=True).exists():
+                    break
+        self.request('get', reverse('complete_quest', args=[hero.id, quest_id]))
+
+    def go_shopping(self, hero):
+        self.request('get', reverse('shop_page', args=[hero.id]))
+        hero.refresh_from_db(fields=['gold_amount', 'level'])
+        item_id = (
+            shop.band_stock(level_band(hero.level))
+            .filter(owner__isnull=True, price__lte=hero.gold_amount)
+            .order_by('price')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if item_id is None:
+            return
+        self.request('post', reverse('buy_item', args=[hero.id, item_id]))
+        self.request('post', reverse('equip_item', args=[hero.id, item_id]))
+
+    def play(self, name, quests, arena_fights):
+        self.request('post', reverse('create_character'), {'name': name})
+        hero = Character.objects.get(name=name)
+        self.request('get', reverse('character_detail', args=[hero.id]))
+
+        for _ in range(quests):
+            self.play_quest(hero)
+            for _ in range(arena_fights):
+                self.request('post', reverse('generate_new_enemy', args=[hero.id]))
+                enemy = Enemy.objects.filter(quest__isnull=True, is_defeated=False).order_by('-id').first()
+                if enemy:
+                    self.fight(hero, enemy.id)
+            self.go_shopping(hero)
+            self.request('get', reverse('leaderboard'))
+
+
+def table_sizes():
+    """{table: (rows, bytes)} - bytes include the table's indexes."""
+    rows = {}
+    with connection.cursor() as cursor:
+        for table in TRACKED_TABLES:
+            cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+            rows[table] = cursor.fetchone()[0]
+        try:
+            cursor.execute(
+                "SELECT COALESCE(m.tbl_name, s.name), SUM(s.pgsize) FROM dbstat s "
+                "LEFT JOIN sqlite_master m ON m.name = s.name GROUP BY 1"
+            )
+            sizes = dict(cursor.fetchall())
+        except Exception:
+            # SQLite built without the dbstat table
+            sizes = {}
+    return {table: (rows[table], sizes.get(table)) for table in TRACKED_TABLES}
+
+
+class Command(BaseCommand):
+    help = (
+        "Play simulated heroes through the real views against a scratch database and report "
+        "table growth per player-hour, SQL statements and CPU time per action."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--heroes', type=int, default=200)
+        parser.add_argument('--quests', type=int, default=5, help="Quests per hero")
+        parser.add_argument('--arena-fights', type=int, default=1, help="Random encounters after every quest")
+        parser.add_argument('--actions-per-hour', type=int, default=240,
+                            help="Page views a real player makes per hour, to turn actions into player-hours")
+        parser.add_argument('--players', type=int, default=1000, help="Players to forecast 30 days of growth for")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help="Keep the scratch database and print its path")
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        scratch_dir = tempfile.mkdtemp(prefix='simulate-world-')
+        pack_path = os.path.join(scratch_dir, 'content_pack.sqlite3')
+
+        # Procedural content stands in for the AI service
+        content_pack.write(pack_path, {
+            (kind, band): rows
+            for band in all_bands()
+            for kind, rows in (
+                (content_pack.ENEMY, [procedural.enemy(band_reference_level(band)) for _ in range(200)]),
+                (content_pack.QUEST, procedural.quests(band_reference_level(band), 60)),
+                (content_pack.ITEM, procedural.shop_items(band_reference_level(band), 60)),
+            )
+        })
+
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(scratch_dir, 'world.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                CONTENT_PACK_PATH=pack_path,
+                BACKGROUND_TASKS_INLINE=True,
+                AI_SERVICE_URL='http://127.0.0.1:9',
+                AI_SERVICE_RETRIES=0,
+                AI_RATE_LIMIT_BURST=10 ** 9,
+                ALLOWED_HOSTS=['localhost'],
+            ):
+                content_pack.refresh()
+                self.run_simulation(options)
+        finally:
+            content_pack.refresh()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keep'])
+            if options['keep']:
+                self.stdout.write(f"Scratch database kept in {scratch_dir}")
+
+    def run_simulation(self, options):
+        simulation = Simulation()
+        before = table_sizes()
+        wall_started = time.monotonic()
+
+        for index in range(options['heroes']):
+            simulation.play(f"Sim-{index}", options['quests'], options['arena_fights'])
+            if (index + 1) % 50 == 0:
+                self.stdout.write(f"  {index + 1} heroes played")
+
+        wall = time.monotonic() - wall_started
+        # Whatever the combat log still holds belongs to this run
+        combat_log.flush()
+        after = table_sizes()
+        total_actions = sum(action.count for action in simulation.actions.values())
+        player_hours = total_actions / options['actions_per_hour']
+
+        self.stdout.write(f"\n{options['heroes']} heroes, {total_actions} actions in {wall:.1f}s "
+                          f"= {player_hours:.1f} player-hours at {options['actions_per_hour']} actions/hour\n")
+
+        self.stdout.write(f"{'action':<22}{'count':>8}{'SQL/action':>12}{'CPU ms/action':>15}{'errors':>8}")
+        for name, action in sorted(simulation.actions.items(), key=lambda pair: -pair[1].cpu):
+            self.stdout.write(
+                f"{name:<22}{action.count:>8}{action.queries / action.count:>12.1f}"
+                f"{action.cpu / action.count * 1000:>15.2f}{action.errors:>8}"
+            )
+
+        forecast_hours = options['players'] * 24 * 30
+        self.stdout.write(f"\n{'table':<24}{'rows':>9}{'rows/ph':>10}{'bytes/ph':>11}{'B/row':>8}"
+                          f"{'30d rows':>13}{'30d MB':>10}")
+        for table in TRACKED_TABLES:
+            rows_before, bytes_before = before[table]
+            rows_after, bytes_after = after[table]
+            rows_per_hour = (rows_after - rows_before) / player_hours
+            if bytes_after is None:
+                bytes_per_hour = bytes_per_row = float('nan')
+            else:
+                bytes_per_hour = (bytes_after - (bytes_before or 0)) / player_hours
+                bytes_per_row = bytes_after / rows_after if rows_after else 0
+            self.stdout.write(
+                f"{table:<24}{rows_after:>9}{rows_per_hour:>10.1f}{bytes_per_hour:>11.0f}{bytes_per_row:>8.0f}"
+                f"{rows_per_hour * forecast_hours:>13.0f}{bytes_per_hour * forecast_hours / 1e6:>10.1f}"
+            )
+        self.stdout.write(
+            f"\n30d = {options['players']} players online around the clock for 30 days "
+            f"({forecast_hours:,} player-hours). Only the combat log is ever pruned "
+            f"(prune_combat_log), everything else only grows."
+        )
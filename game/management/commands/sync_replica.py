@@ -0,0 +1,41 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary into the replica file (GAME_REPLICA_DB) every few seconds, "
+        "standing in for real replication when testing the replica routing locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between copies")
+        parser.add_argument('--once', action='store_true', help="Copy once and exit")
+
+    def handle(self, *args, **options):
+        if not replicas.enabled():
+            raise CommandError("No replica configured - set GAME_REPLICA_DB.")
+        primary = str(settings.DATABASES['default']['NAME'])
+        replica = str(settings.DATABASES[replicas.REPLICA]['NAME'])
+        if options['interval'] >= settings.REPLICA_MAX_LAG_SECONDS:
+            self.stderr.write(f"Warning: copies lag more than REPLICA_MAX_LAG_SECONDS ({settings.REPLICA_MAX_LAG_SECONDS}s).")
+
+        while True:
+            started = time.monotonic()
+            source = sqlite3.connect(primary, timeout=20)
+            target = sqlite3.connect(replica, timeout=20)
+            try:
+                # Copies in place under SQLite's locks, so open replica readers stay valid
+                source.backup(target)
+            finally:
+                source.close()
+                target.close()
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f"Copied {primary} to {replica}."))
+                return
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
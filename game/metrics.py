@@ -0,0 +1,239 @@
+# ===== METRICS =====
+# Per-view request latency, SQL query count/time and response size, exposed
+# in the Prometheus text format at /game/metrics.
+#
+# Every process keeps its numbers in memory. When METRICS_DIR is set each
+# process also dumps a snapshot there every few seconds, and the metrics view
+# adds up the snapshots of all worker processes. Empty the directory when the
+# server is restarted, like prometheus_client's multiprocess mode.
+from bisect import bisect_left
+from contextvars import ContextVar
+import json
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HELP = {
+    'game_request_duration_seconds': ('histogram', "Request latency per view"),
+    'game_response_size_bytes': ('histogram', "Response body size per view"),
+    'game_request_queries': ('histogram', "SQL queries executed per request"),
+    'game_requests_total': ('counter', "Requests per view and status code"),
+    'game_db_queries_total': ('counter', "SQL queries executed per view"),
+    'game_db_query_seconds_total': ('counter', "Time spent in SQL per view"),
+    'game_ai_calls_total': ('counter', "AI service calls per endpoint and outcome"),
+    'game_ai_rejected_total': ('counter', "Generation requests turned away by admission control"),
+    'game_ai_queue_wait_seconds': ('histogram', "Time AI calls waited for a free slot"),
+}
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0, 'count': 0}
+            index = bisect_left(histogram['buckets'], value)
+            if index < len(buckets):
+                histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, dict(h, counts=list(h['counts']))] for (name, labels), h in self.histograms.items()],
+            }
+
+
+REGISTRY = Registry()
+_last_flush = 0
+
+
+def _flush(force=False):
+    """Write this process' numbers to METRICS_DIR (at most every few seconds)."""
+    global _last_flush
+    directory = settings.METRICS_DIR
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS):
+        return
+    _last_flush = now
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(path + ".tmp", path)
+
+
+def _snapshots():
+    yield REGISTRY.snapshot()
+
+    directory = settings.METRICS_DIR
+    if not directory or not os.path.isdir(directory):
+        return
+    own_file = f"{os.getpid()}.json"
+    for filename in os.listdir(directory):
+        if filename.endswith(".json") and filename != own_file:
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue
+
+
+def _label_text(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def render():
+    """Merge all process snapshots and format them as Prometheus text."""
+    counters = {}
+    histograms = {}
+    for snapshot in _snapshots():
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in snapshot['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, {'buckets': h['buckets'], 'counts': [0] * len(h['buckets']), 'sum': 0, 'count': 0})
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], h['counts'])]
+            merged['sum'] += h['sum']
+            merged['count'] += h['count']
+
+    lines = []
+    for metric, (kind, help_text) in HELP.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        if kind == 'counter':
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f"{metric}{_label_text(labels)} {value}")
+        else:
+            for (name, labels), h in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip(h['buckets'], h['counts']):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_bucket{_label_text(labels, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{metric}_sum{_label_text(labels)} {h['sum']}")
+                lines.append(f"{metric}_count{_label_text(labels)} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class QueryCounter:
+    """Counts and times the SQL statements of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+# The counter of the request being handled. A context variable follows the
+# request into sync_to_async threads, where async views run their queries.
+_current_queries = ContextVar('game_metrics_queries', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _current_queries.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # Every connection gets the execute_wrapper once, whichever thread opens it
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def install_on_open_connections():
+    for connection in connections.all(initialized_only=True):
+        install_query_counter(None, connection)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported missed the signal
+        install_on_open_connections()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries = QueryCounter()
+        token = _current_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        token = _current_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    def record(self, request, response, duration, queries):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        labels = (('view', view),)
+
+        REGISTRY.inc('game_requests_total', labels + (('status', response.status_code),))
+        REGISTRY.observe('game_request_duration_seconds', labels, duration, LATENCY_BUCKETS)
+        REGISTRY.observe('game_request_queries', labels, queries.count, QUERY_BUCKETS)
+        REGISTRY.inc('game_db_queries_total', labels, queries.count)
+        REGISTRY.inc('game_db_query_seconds_total', labels, queries.seconds)
+        if not response.streaming:
+            REGISTRY.observe('game_response_size_bytes', labels, len(response.content), SIZE_BUCKETS)
+        _flush()
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0018_item_is_equipped'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='level_band',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='stocked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['is_in_shop', 'level_band'], name='item_shop_band_idx'),
+        ),
+    ]
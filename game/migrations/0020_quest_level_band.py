@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0019_item_level_band_stocked_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quest',
+            name='level_band',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='quest',
+            index=models.Index(fields=['level_band', 'assigned_to'], name='quest_band_pool_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rank_existing_heroes(apps, schema_editor):
+    Character = apps.get_model('game', 'Character')
+    LeaderboardEntry = apps.get_model('game', 'LeaderboardEntry')
+    heroes = Character.objects.order_by('-level', '-xp', 'id').values_list('id', 'level', 'xp')
+    LeaderboardEntry.objects.bulk_create(
+        LeaderboardEntry(character_id=char_id, level=level, xp=xp, rank=rank)
+        for rank, (char_id, level, xp) in enumerate(heroes, start=1)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0020_quest_level_band'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.IntegerField(default=1)),
+                ('xp', models.IntegerField(default=0)),
+                ('rank', models.IntegerField(db_index=True)),
+                ('character', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to='game.character')),
+            ],
+        ),
+        migrations.RunPython(rank_existing_heroes, migrations.RunPython.noop),
+    ]
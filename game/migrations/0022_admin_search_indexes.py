@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:29
+
+from django.db import migrations, models
+
+
+# NOCASE is SQLite's built-in case-insensitive collation and doesn't exist on
+# other databases. Running this on PostgreSQL or MySQL needs the collation
+# swapped for that backend's own (e.g. a nondeterministic ICU collation).
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0021_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='character',
+            name='name',
+            field=models.CharField(db_collation='NOCASE', db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='enemy',
+            name='name',
+            field=models.CharField(db_collation='NOCASE', db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='name',
+            field=models.CharField(db_collation='NOCASE', db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='quest',
+            name='title',
+            field=models.CharField(db_collation='NOCASE', db_index=True, max_length=200),
+        ),
+    ]
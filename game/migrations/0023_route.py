@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0022_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Route',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost', models.PositiveIntegerField(default=10)),
+                ('end', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='routes_in', to='game.location')),
+                ('start', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='routes_out', to='game.location')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0023_route'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpawnEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('min_level', models.IntegerField(default=1)),
+                ('max_level', models.IntegerField(default=100)),
+                ('weight', models.PositiveIntegerField(default=10)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='enemy',
+            name='location',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='enemies', to='game.location'),
+        ),
+        migrations.AddIndex(
+            model_name='enemy',
+            index=models.Index(fields=['location', 'is_defeated'], name='enemy_location_idx'),
+        ),
+        migrations.AddField(
+            model_name='spawnentry',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spawns', to='game.location'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0024_spawn_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CombatLogPartition',
+            fields=[
+                ('day', models.IntegerField(primary_key=True, serialize=False)),
+                ('first_event_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CombatEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('at', models.IntegerField()),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Attack'), (2, 'Damage'), (3, 'Victory'), (4, 'Loot'), (5, 'Level up'), (6, 'Defeat')])),
+                ('value', models.IntegerField(default=0)),
+                ('character', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='game.character')),
+                ('enemy', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='game.enemy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['character', 'at'], name='combat_event_hero_idx')],
+            },
+        ),
+    ]
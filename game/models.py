@@ -8,8 +8,38 @@ class Location(models.Model):
     def __str__(self):
         return self.name
 
-class Enemy(models.Model):
+# ===== ROUTE MODEL =====
+# A road between two locations. Roads go both ways; game/world_map.py finds
+# the cheapest way between any two locations.
+class Route(models.Model):
+    start = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='routes_out')
+    end = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='routes_in')
+
+    # Gold it costs to take the road
+    cost = models.PositiveIntegerField(default=10)
+
+    def __str__(self):
+        return f"{self.start} - {self.end} ({self.cost}g)"
+
+# ===== SPAWN TABLE MODEL =====
+# One line of a location's spawn table: which enemy turns up there, for
+# which hero levels and how often compared to the rest (see game/spawns.py).
+class SpawnEntry(models.Model):
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='spawns')
     name = models.CharField(max_length=100)
+    min_level = models.IntegerField(default=1)
+    max_level = models.IntegerField(default=100)
+    weight = models.PositiveIntegerField(default=10)
+
+    def __str__(self):
+        return f"{self.name} @ {self.location} (levels {self.min_level}-{self.max_level}, weight {self.weight})"
+
+class Enemy(models.Model):
+    # NOCASE + index: the admin's "starts with" search can use the index.
+    # NOCASE only exists on SQLite, like every db_collation='NOCASE' below:
+    # another backend needs these (and migration 0022) switched to one of its
+    # own case-insensitive collations first, or migrate fails.
+    name = models.CharField(max_length=100, db_collation='NOCASE', db_index=True)
     level = models.IntegerField(default=1, max_length=100)
     mana = models.IntegerField(default=50)
     armor = models.IntegerField(default=50)
@@ -28,13 +58,32 @@ class Enemy(models.Model):
         blank=True
     )
 
+    # Where the enemy roams - the enemy list only shows the hero's location
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        related_name='enemies',
+        null=True,
+        blank=True,
+        db_index=False, # covered by enemy_location_idx
+    )
+
+    # Set on every save - exports pick up changed rows by it (game/exports.py).
+    # queryset.update() has to set it itself.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['location', 'is_defeated'], name='enemy_location_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 # ===== CHARACTER MODEL =====
 class Character(models.Model):
-    # This stores the character's name as text
-    name = models.CharField(max_length=100)
+    # This stores the character's name as text (indexed for the admin search)
+    name = models.CharField(max_length=100, db_collation='NOCASE', db_index=True)
     
     # This stores health as a whole number - starts at 100
     health = models.IntegerField(default=100)
@@ -68,6 +117,8 @@ class Character(models.Model):
         blank=True
     )
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     # This makes the character show their name in the admin panel
     def __str__(self):
         return self.name
@@ -83,7 +134,7 @@ class Item(models.Model):
         AMULET = 'AMULET', 'Amulet'
         WEAPON = 'WEAPON', 'Weapon'
 
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_collation='NOCASE', db_index=True)
     is_equipped = models.BooleanField(default=False)
     item_type = models.CharField(
         max_length=10, 
@@ -94,6 +145,10 @@ class Item(models.Model):
     power_bonus = models.IntegerField(default=0)
     price = models.IntegerField(default=50)
     is_in_shop = models.BooleanField(default=False)
+
+    # Which level band's shelf the item sits on and when it was put there
+    level_band = models.IntegerField(default=0)
+    stocked_at = models.DateTimeField(null=True, blank=True)
     
     owner = models.ForeignKey(
         'Character', 
@@ -103,15 +158,26 @@ class Item(models.Model):
         blank=True
     )
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # shop_page looks up one band's shelf at a time
+            models.Index(fields=['is_in_shop', 'level_band'], name='item_shop_band_idx'),
+        ]
+
     def __str__(self):
         return f"[{self.item_type}] {self.name}"
     
 # ===== QUEST MODEL =====
 class Quest(models.Model):
-    title = models.CharField(max_length=200)
+    title = models.CharField(max_length=200, db_collation='NOCASE', db_index=True)
     description = models.TextField()
     xp_reward = models.IntegerField(default=20)
     is_completed = models.BooleanField(default=False)
+
+    # Which level band's quest board the quest was written for
+    level_band = models.IntegerField(default=0)
     
     # Updated to allow null (database level) and blank (form level)
     assigned_to = models.ForeignKey(
@@ -122,9 +188,76 @@ class Quest(models.Model):
         blank=True   # Allows the Django admin/forms to leave this empty
     )
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # The quest board reads the unassigned pool of one band at a time
+            models.Index(fields=['level_band', 'assigned_to'], name='quest_band_pool_idx'),
+        ]
+
     def __str__(self):
         status = "Done" if self.is_completed else "Active"
         # Handle the case where the quest isn't assigned yet
         owner = self.assigned_to.name if self.assigned_to else "Unassigned"
         return f"{self.title} ({owner}) - {status}"
-    
\ No newline at end of file
+    
+# ===== LEADERBOARD MODEL =====
+# Denormalized copy of every hero's level/xp with their current rank.
+# Kept up to date incrementally by game/leaderboard.py.
+class LeaderboardEntry(models.Model):
+    character = models.OneToOneField(
+        Character,
+        on_delete=models.CASCADE,
+        related_name="leaderboard_entry"
+    )
+    level = models.IntegerField(default=1)
+    xp = models.IntegerField(default=0)
+
+    # 1 = best hero. Ranks are always contiguous, ties are broken by who got there first
+    rank = models.IntegerField(db_index=True)
+
+    def __str__(self):
+        return f"#{self.rank} {self.character.name} (Level {self.level}, {self.xp} XP)"
+
+# ===== COMBAT LOG MODELS =====
+# Append-only record of every combat turn, written in batches by
+# game/combat_log.py. Kept small on purpose: integer timestamp, integer
+# kind, no foreign key constraints (heroes and enemies may be deleted, their
+# history stays).
+class CombatEvent(models.Model):
+    class Kind(models.IntegerChoices):
+        ATTACK = 1, 'Attack'
+        DAMAGE = 2, 'Damage'
+        VICTORY = 3, 'Victory'
+        LOOT = 4, 'Loot'
+        LEVEL_UP = 5, 'Level up'
+        DEFEAT = 6, 'Defeat'
+
+    # Unix time in seconds
+    at = models.IntegerField()
+    kind = models.PositiveSmallIntegerField(choices=Kind.choices)
+    character = models.ForeignKey(Character, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    enemy = models.ForeignKey(Enemy, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+')
+    # Damage dealt/taken, xp, gold or the new level, depending on the kind
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Replaying one hero's fights
+            models.Index(fields=['character', 'at'], name='combat_event_hero_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.at} hero {self.character_id} {self.get_kind_display()} {self.value}"
+
+# The first event id of every day. Events are only ever appended, so a day is
+# the id range up to the next day's first id, and cleanup deletes whole days
+# by primary key range instead of scanning timestamps.
+class CombatLogPartition(models.Model):
+    # Days since the Unix epoch
+    day = models.IntegerField(primary_key=True)
+    first_event_id = models.BigIntegerField()
+
+    def __str__(self):
+        return f"Day {self.day} from event {self.first_event_id}"
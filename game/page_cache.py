@@ -0,0 +1,93 @@
+# ===== PAGE CACHE =====
+# Read-through cache for the per-character page contexts (character_detail,
+# quest_log, battle_arena).
+#
+# Every hero has a version number in the cache and every cached context is
+# stored under the version it was built for. Anything that changes the hero's
+# rows bumps the version (see signals.py), which makes all of their cached
+# pages unreachable at once - no need to track individual keys.
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import replicas
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def _version(key):
+    cache = _cache()
+    version = cache.get(key)
+    if version is None:
+        # Seed with the clock so a version evicted from the cache can never
+        # come back with a number that was already handed out
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def hero_version(char_id):
+    return _version(f"game:hero:{char_id}:version")
+
+
+def band_version(band):
+    return _version(f"game:band:{band}:version")
+
+
+def map_version():
+    return _version("game:map:version")
+
+
+def bump_map():
+    _bump("game:map:version")
+
+
+def spawns_version():
+    return _version("game:spawns:version")
+
+
+def bump_spawns():
+    _bump("game:spawns:version")
+
+
+def bump_hero(*char_ids):
+    for char_id in set(char_ids):
+        if char_id is not None:
+            _bump(f"game:hero:{char_id}:version")
+
+
+def bump_band(*bands):
+    for band in set(bands):
+        _bump(f"game:band:{band}:version")
+
+
+def cached(key, builder):
+    """Return the cached value for key or build, store and return it."""
+    cache = _cache()
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        # Built from a lagging replica: may already be stale, keep it only as long as the lag
+        timeout = settings.REPLICA_MAX_LAG_SECONDS if replicas.active() else settings.PAGE_CACHE_TIMEOUT
+        cache.set(key, value, timeout)
+    return value
+
+
+def hero_cached(char_id, page, builder, *extra):
+    key = ":".join(str(part) for part in ("game:page", page, char_id, hero_version(char_id), *extra))
+    return cached(key, builder)
+
+
+def band_cached(band, page, builder):
+    return cached(f"game:page:{page}:band:{band}:{band_version(band)}", builder)
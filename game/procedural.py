@@ -0,0 +1,91 @@
+# Formula based content generation.
+# Used whenever the AI service is too slow, unavailable or simply not needed.
+# Keep this module free of Django imports so other tools can reuse it.
+import random
+
+ENEMY_NAMES = ['Goblin', 'Dire Wolf', 'Bandit', 'Cave Spider', 'Skeleton', 'Bog Troll', 'Harpy', 'Slime']
+ENEMY_TITLES = ['Scout', 'Brute', 'Shaman', 'Elder', 'Raider', 'Warlord']
+
+
+def enemy(level, player_health=100, player_strength=50):
+    # Same ranges ai_generator.py hands the model for its stat block
+    return {
+        'name': f"{random.choice(ENEMY_NAMES)} {random.choice(ENEMY_TITLES)}",
+        'level': level,
+        'health': int(random.uniform(player_health * 1.5, player_health * 1.8)),
+        'attack_power': int(random.uniform(player_strength * 0.4, player_strength * 0.6)),
+        'xp_reward': int(random.uniform(player_strength * 0.2, player_strength * 0.4)),
+    }
+
+
+ITEM_TYPES = ['HEAD', 'CHEST', 'FEET', 'GLOVES', 'RING', 'AMULET', 'WEAPON']
+
+ITEM_NAMES = {
+    'HEAD': ['Helm', 'Hood', 'Circlet', 'Cap'],
+    'CHEST': ['Breastplate', 'Robe', 'Hauberk', 'Jerkin'],
+    'FEET': ['Boots', 'Greaves', 'Sandals', 'Treads'],
+    'GLOVES': ['Gauntlets', 'Gloves', 'Handwraps', 'Bracers'],
+    'RING': ['Band', 'Signet', 'Loop', 'Ring'],
+    'AMULET': ['Pendant', 'Talisman', 'Charm', 'Amulet'],
+    'WEAPON': ['Sword', 'Axe', 'Mace', 'Spear', 'Staff', 'Bow'],
+}
+
+ITEM_PREFIXES = ['Rusty', 'Sturdy', 'Gleaming', 'Runed', 'Ancient', 'Blessed', 'Cursed', 'Ember']
+ITEM_SUFFIXES = ['of the Bear', 'of Embers', 'of the Owl', 'of Vigor', 'of the Wolf', 'of Dawn']
+
+
+def shop_item(level):
+    item_type = random.choice(ITEM_TYPES)
+    health_bonus = 0
+    power_bonus = 0
+
+    # Weapons and rings hit harder, armor keeps you alive, amulets do a bit of both
+    if item_type in ('WEAPON', 'RING', 'GLOVES'):
+        power_bonus = int(level * random.uniform(1.5, 3))
+    elif item_type == 'AMULET':
+        health_bonus = int(level * random.uniform(1, 3))
+        power_bonus = int(level * random.uniform(0.5, 1.5))
+    else:
+        health_bonus = int(level * random.uniform(3, 6))
+
+    name = f"{random.choice(ITEM_PREFIXES)} {random.choice(ITEM_NAMES[item_type])}"
+    if random.random() < 0.5:
+        name += f" {random.choice(ITEM_SUFFIXES)}"
+
+    return {
+        'name': name,
+        'item_type': item_type,
+        'health_bonus': max(health_bonus, 0),
+        'power_bonus': max(power_bonus, 0),
+        'price': max(int((health_bonus + power_bonus * 2) * random.uniform(4, 6)), 10),
+    }
+
+
+def shop_items(level, count=3):
+    return [shop_item(level) for _ in range(count)]
+
+
+QUEST_TARGETS = ['Dire Wolves', 'Goblins', 'Bandits', 'Cave Spiders', 'Restless Skeletons', 'Bog Trolls', 'Harpies']
+QUEST_PLACES = ['the Old Mill', 'Blackwood Forest', 'the Sunken Crypt', 'the Northern Pass', 'the Salt Marsh']
+QUEST_TEMPLATES = [
+    ('Slay the {target}', 'The {target} near {place} grow bolder every night. Put an end to them.'),
+    ('Clear {place}', '{place} is overrun by {target}. Clear it out.'),
+    ('Hunt the {target}', 'A bounty has been posted for the {target} haunting {place}.'),
+]
+
+
+def quest(level):
+    title, description = random.choice(QUEST_TEMPLATES)
+    words = {'target': random.choice(QUEST_TARGETS), 'place': random.choice(QUEST_PLACES)}
+    # Same curve the AI prompt uses for its rewards
+    base_xp = int((level ** 1.5) * 50)
+    description = description.format(**words)
+    return {
+        'title': title.format(**words),
+        'description': description[0].upper() + description[1:],
+        'xp_reward': int(base_xp * random.uniform(0.8, 1.2)),
+    }
+
+
+def quests(level, count=3):
+    return [quest(level) for _ in range(count)]
@@ -0,0 +1,126 @@
+# ===== QUEST BOARD =====
+# Unassigned quests live in a pool per level band. Heroes pick from their
+# band's pool and the pool is topped back up to QUEST_POOL_DEPTH in the
+# background, so no player ever waits for (or wipes) someone else's board.
+#
+# Everything that adds to or retires from a band's pool does it under the
+# band's claim (tasks.claim), re-counting the pool first, so two writers
+# can't both fill the same gap.
+import logging
+
+from django.conf import settings
+
+from . import ai_service, content_pack, page_cache, procedural, replicas
+from .bands import band_reference_level
+from .models import Quest
+from .tasks import claim, submit_once
+
+logger = logging.getLogger(__name__)
+
+# How long a first visitor waits for someone else to finish writing the board
+FILL_WAIT_SECONDS = 5
+
+
+def band_pool(band):
+    return Quest.objects.filter(assigned_to__isnull=True, level_band=band)
+
+
+def _filling(band, wait=0):
+    return claim(f"game:quests:{band}:filling", wait=wait)
+
+
+def _generate(band, count, use_ai=True, formulas=True):
+    """Data for up to count quests: content pack, then AI, then (with formulas) the formulas."""
+    level = band_reference_level(band)
+    # The content pack answers instantly, the AI is only asked without one
+    generated = content_pack.draw(content_pack.QUEST, band, count)
+
+    if use_ai and not generated:
+        # The AI writes 3 quests per call
+        while len(generated) < count:
+            try:
+                batch = ai_service.generate_quests(level)
+            except Exception:
+                logger.exception("Quest generation for band %s failed", band)
+                break
+            if not batch:
+                break
+            generated.extend(batch)
+
+    generated = generated[:count]
+    if formulas:
+        generated += procedural.quests(level, count - len(generated))
+    return generated
+
+
+def _add(band, generated):
+    # Only call with the band's claim held
+    missing = settings.QUEST_POOL_DEPTH - band_pool(band).count()
+    if missing <= 0 or not generated:
+        return []
+
+    created = Quest.objects.bulk_create([
+        Quest(
+            title=data['title'][:200],
+            description=data['description'],
+            xp_reward=data['xp_reward'],
+            level_band=band,
+        )
+        for data in generated[:missing]
+    ])
+
+    # bulk_create() skips the signals - refresh the band's cached board ourselves
+    page_cache.bump_band(band)
+    return created
+
+
+@replicas.on_primary
+def top_up(band, use_ai=True):
+    """Fill the band's pool back up to QUEST_POOL_DEPTH quests."""
+    missing = settings.QUEST_POOL_DEPTH - band_pool(band).count()
+    if missing <= 0:
+        return []
+
+    # The slow part (the AI) runs without the claim, only the insert needs it
+    generated = _generate(band, missing, use_ai=use_ai)
+    with _filling(band, wait=FILL_WAIT_SECONDS) as claimed:
+        if not claimed:
+            logger.warning("Quest pool of band %s stayed busy, dropped %d quests", band, len(generated))
+            return []
+        return _add(band, generated)
+
+
+@replicas.on_primary
+def fill_empty_band(band):
+    """Write a board for a band that has none yet, return the band's pool.
+
+    Never waits for the AI: the quests come from the content pack or the
+    formulas. Two first visits at once must not both write it, so only the
+    one holding the claim does; the other waits for the claim and then sees
+    that board."""
+    with _filling(band, wait=FILL_WAIT_SECONDS) as claimed:
+        pool = list(band_pool(band))
+        if pool or not claimed:
+            return pool
+        return _add(band, _generate(band, settings.QUEST_POOL_DEPTH, use_ai=False))
+
+
+@replicas.on_primary
+def refresh(band):
+    """Retire the band's QUEST_REFRESH_COUNT oldest unclaimed quests.
+
+    Replacements from the content pack go up right away; whatever it can't
+    cover is left to the background top-up (schedule_top_up), which asks the
+    AI - a refresh never waits for it."""
+    with _filling(band) as claimed:
+        # A refresh already running does the job for both
+        if not claimed:
+            return []
+        # No creation time on quests - the lowest ids are the oldest
+        oldest = list(band_pool(band).order_by('id').values_list('id', flat=True)[:settings.QUEST_REFRESH_COUNT])
+        band_pool(band).filter(pk__in=oldest).delete()
+        return _add(band, _generate(band, len(oldest), use_ai=False, formulas=False))
+
+
+def schedule_top_up(band):
+    return submit_once(f"quest-band-{band}", top_up, band)
@@ -0,0 +1,111 @@
+# ===== READ REPLICA ROUTING =====
+# When a 'replica' database is configured (GAME_REPLICA_DB), the read-mostly
+# views in REPLICA_READ_VIEWS read from it and leave the primary to the combat
+# writes. Everything else, and every write, uses 'default'.
+#
+# A replica lags behind. After a POST the session stays on the primary for
+# REPLICA_MAX_LAG_SECONDS, so players always see their own changes. Pages
+# cached from replica reads only live that long too (see page_cache.cached),
+# so a lagging read can't stay in the cache.
+from contextvars import ContextVar
+import functools
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD')
+STICKY_KEY = 'db_primary_until'
+
+# Set while a request is allowed to read from the replica. Follows the request
+# into sync_to_async threads like the metrics query counter does.
+_reading_replica = ContextVar('game_reading_replica', default=False)
+
+
+def enabled():
+    return REPLICA in settings.DATABASES
+
+
+def active():
+    """True while the current request reads from the replica."""
+    return _reading_replica.get()
+
+
+def on_primary(func):
+    """Run func with every read on the primary.
+
+    For code that reads to decide what to write (stocking a shelf, topping up
+    a quest board): on a lagging replica it would keep seeing the state from
+    before its own writes, or from before another request's."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _reading_replica.set(False)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _reading_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return REPLICA if _reading_replica.get() else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, it gets the schema from there
+        return db != REPLICA
+
+
+def _read_view(request):
+    if not enabled() or request.method not in SAFE_METHODS:
+        return False
+    try:
+        return resolve(request.path_info).url_name in settings.REPLICA_READ_VIEWS
+    except Resolver404:
+        return False
+
+
+class ReplicaMiddleware:
+    """Picks the database for the request. Goes after SessionMiddleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        use_replica = _read_view(request) and request.session.get(STICKY_KEY, 0) < time.time()
+        token = _reading_replica.set(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            _reading_replica.reset(token)
+        if enabled() and request.method not in SAFE_METHODS:
+            request.session[STICKY_KEY] = time.time() + settings.REPLICA_MAX_LAG_SECONDS
+        return response
+
+    async def __acall__(self, request):
+        use_replica = _read_view(request) and await request.session.aget(STICKY_KEY, 0) < time.time()
+        token = _reading_replica.set(use_replica)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _reading_replica.reset(token)
+        if enabled() and request.method not in SAFE_METHODS:
+            await request.session.aset(STICKY_KEY, time.time() + settings.REPLICA_MAX_LAG_SECONDS)
+        return response
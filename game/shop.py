@@ -0,0 +1,119 @@
+# ===== SHOP STOCK =====
+# Every level band has its own shelf. Stock is generated ahead of demand by the
+# restock_shop command (or a background job) and rotated after
+# SHOP_ROTATION_HOURS, so shop_page never has to wait for the AI service.
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import ai_service, content_pack, procedural, replicas
+from .bands import all_bands, band_reference_level
+from .models import Item
+from .tasks import claim, submit_once
+
+logger = logging.getLogger(__name__)
+
+# How long a visitor waits for someone else to finish stocking a shelf
+STOCKING_WAIT_SECONDS = 5
+
+
+def band_stock(band):
+    return Item.objects.filter(is_in_shop=True, level_band=band)
+
+
+def stock_band(band, use_ai=True):
+    """Put a fresh batch of SHOP_ITEMS_PER_BAND items on the band's shelf."""
+    level = band_reference_level(band)
+    wanted = settings.SHOP_ITEMS_PER_BAND
+    # The content pack answers instantly, the AI is only asked without one
+    generated = content_pack.draw(content_pack.ITEM, band, wanted)
+
+    if use_ai and not generated:
+        # The AI hands out 3 items per call
+        while len(generated) < wanted:
+            try:
+                batch = ai_service.generate_shop_items(level)
+            except Exception:
+                logger.exception("Shop generation for band %s failed", band)
+                break
+            if not batch:
+                break
+            generated.extend(batch)
+
+    # Top up whatever the AI couldn't deliver
+    generated = generated[:wanted]
+    generated += procedural.shop_items(level, wanted - len(generated))
+
+    now = timezone.now()
+    valid_types = set(Item.ItemType.values)
+    return Item.objects.bulk_create([
+        Item(
+            name=data['name'][:100],
+            item_type=data['item_type'] if data['item_type'] in valid_types else Item.ItemType.WEAPON,
+            health_bonus=data['health_bonus'],
+            power_bonus=data['power_bonus'],
+            price=data['price'],
+            is_in_shop=True,
+            level_band=band,
+            stocked_at=now,
+        )
+        for data in generated
+    ])
+
+
+def _stocking(band, wait=0):
+    return claim(f"game:shop:{band}:stocking", wait=wait)
+
+
+@replicas.on_primary
+def stock_empty_band(band):
+    """Stock an empty shelf right away without the AI, return what is on it.
+
+    Two first visits at once must not both stock it, so only the one holding
+    the claim does; the other waits for the claim and then sees that stock."""
+    with _stocking(band, wait=STOCKING_WAIT_SECONDS) as claimed:
+        # Somebody may have finished stocking just before we got the claim
+        items = list(band_stock(band))
+        if items or not claimed:
+            return items
+        return stock_band(band, use_ai=False)
+
+
+@replicas.on_primary
+def rotate_band(band, use_ai=True):
+    """Restock the band first, then clear out the unsold old stock in one query."""
+    with _stocking(band) as claimed:
+        if not claimed:
+            # Someone else is stocking this shelf right now
+            return 0
+        return _rotate_band(band, use_ai)
+
+
+def _rotate_band(band, use_ai):
+    cutoff = timezone.now() - timedelta(hours=settings.SHOP_ROTATION_HOURS)
+    stale = band_stock(band).filter(
+        Q(stocked_at__lt=cutoff) | Q(stocked_at__isnull=True),
+        owner__isnull=True,
+    )
+    if not stale.exists() and band_stock(band).exists():
+        return 0
+
+    stock_band(band, use_ai=use_ai)
+    deleted, _ = stale.delete()
+    return deleted
+
+
+def rotate_all(use_ai=True):
+    return sum(rotate_band(band, use_ai=use_ai) for band in all_bands())
+
+
+def is_stale(items):
+    cutoff = timezone.now() - timedelta(hours=settings.SHOP_ROTATION_HOURS)
+    return any(item.stocked_at is None or item.stocked_at < cutoff for item in items)
+
+
+def schedule_rotation(band):
+    return submit_once(f"shop-band-{band}", rotate_band, band)
@@ -0,0 +1,76 @@
+# Keeps page_cache versions and the leaderboard in step with the database.
+# Note that queryset.update() and bulk_create() don't send signals - code that
+# uses them has to call page_cache.bump_hero()/bump_band() itself.
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import leaderboard, page_cache
+from .models import Character, Enemy, Item, LeaderboardEntry, Location, Quest, Route, SpawnEntry
+
+
+@receiver([post_save, post_delete], sender=Character)
+def character_changed(sender, instance, **kwargs):
+    page_cache.bump_hero(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Item)
+def item_changed(sender, instance, **kwargs):
+    page_cache.bump_hero(instance.owner_id)
+
+
+@receiver([post_save, post_delete], sender=Quest)
+def quest_changed(sender, instance, **kwargs):
+    if instance.assigned_to_id:
+        page_cache.bump_hero(instance.assigned_to_id)
+    else:
+        page_cache.bump_band(instance.level_band)
+
+
+def _enemy_heroes(enemy):
+    # Heroes fighting the enemy plus the owner of the quest it belongs to
+    heroes = list(Character.objects.filter(current_enemy_id=enemy.id).values_list('id', flat=True))
+    if enemy.quest_id:
+        heroes += Quest.objects.filter(pk=enemy.quest_id).values_list('assigned_to_id', flat=True)
+    return heroes
+
+
+@receiver(post_save, sender=Enemy)
+def enemy_saved(sender, instance, **kwargs):
+    page_cache.bump_hero(*_enemy_heroes(instance))
+
+
+@receiver(pre_delete, sender=Enemy)
+def enemy_deleted(sender, instance, **kwargs):
+    # pre_delete - afterwards current_enemy has already been cleared
+    page_cache.bump_hero(*_enemy_heroes(instance))
+
+
+@receiver([post_save, pre_delete], sender=Location)
+def location_changed(sender, instance, **kwargs):
+    page_cache.bump_hero(*Character.objects.filter(current_location_id=instance.id).values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=Route)
+def map_changed(sender, instance, **kwargs):
+    # Every process (this one too) catches up on its next lookup, after the commit
+    transaction.on_commit(page_cache.bump_map)
+
+
+@receiver([post_save, post_delete], sender=SpawnEntry)
+def spawns_changed(sender, instance, **kwargs):
+    transaction.on_commit(page_cache.bump_spawns)
+
+
+@receiver(pre_delete, sender=Character)
+def remember_leaderboard_rank(sender, instance, **kwargs):
+    # The entry is cascade-deleted together with the hero, grab its rank first
+    entry = LeaderboardEntry.objects.filter(character_id=instance.id).first()
+    instance._leaderboard_rank = entry.rank if entry else None
+
+
+@receiver(post_delete, sender=Character)
+def close_leaderboard_gap(sender, instance, **kwargs):
+    if getattr(instance, '_leaderboard_rank', None) is not None:
+        leaderboard.remove(instance._leaderboard_rank)
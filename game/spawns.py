@@ -0,0 +1,80 @@
+# ===== SPAWN TABLES =====
+# Every location can have a spawn table (SpawnEntry rows): the enemies that
+# turn up there, for which hero levels and with which weights.
+#
+# Each (location, level) table is loaded once per process and turned into an
+# alias table, so picking a weighted random enemy costs two random numbers no
+# matter how long the table is. SpawnEntry changes bump a version in the cache
+# (see signals.py) and every process drops its tables on the next draw.
+import random
+import threading
+
+from . import page_cache, procedural
+from .models import SpawnEntry
+
+
+class AliasTable:
+    """Walker's alias method: O(n) to build, O(1) per weighted draw."""
+
+    def __init__(self, items, weights):
+        count = len(items)
+        total = float(sum(weights))
+        self.items = list(items)
+        self.chance = [0.0] * count
+        self.alias = list(range(count))
+
+        # Scale so the average weight is 1, then pair every short column with a tall one
+        scaled = [weight * count / total for weight in weights]
+        small = [index for index, weight in enumerate(scaled) if weight < 1]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            short, tall = small.pop(), large.pop()
+            self.chance[short] = scaled[short]
+            self.alias[short] = tall
+            scaled[tall] -= 1 - scaled[short]
+            (small if scaled[tall] < 1 else large).append(tall)
+        # Whatever is left is 1 up to rounding
+        for index in small + large:
+            self.chance[index] = 1.0
+
+    def sample(self):
+        column = random.randrange(len(self.items))
+        return self.items[column if random.random() < self.chance[column] else self.alias[column]]
+
+
+_tables = {}
+_version = None
+_lock = threading.Lock()
+
+
+def table(location_id, level):
+    """The alias table for heroes of this level at the location, None if nothing spawns there."""
+    global _version
+    version = page_cache.spawns_version()
+    if version != _version:
+        with _lock:
+            _tables.clear()
+            _version = version
+
+    key = (location_id, level)
+    if key not in _tables:
+        entries = list(
+            SpawnEntry.objects
+            .filter(location_id=location_id, min_level__lte=level, max_level__gte=level, weight__gt=0)
+            .values_list('name', 'weight')
+        )
+        _tables[key] = AliasTable([name for name, _ in entries], [weight for _, weight in entries]) if entries else None
+    return _tables[key]
+
+
+def spawn(location_id, level, player_health=100, player_strength=50):
+    """Enemy data drawn from the location's spawn table, None without one."""
+    if location_id is None:
+        return None
+    spawn_table = table(location_id, level)
+    if spawn_table is None:
+        return None
+    # Same stat ranges as every other enemy, so fights stay balanced
+    data = procedural.enemy(level, player_health, player_strength)
+    data['name'] = spawn_table.sample()
+    return data
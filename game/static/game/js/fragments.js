@@ -0,0 +1,57 @@
+// Forms marked data-fragments are sent with fetch. The server answers with
+// just the changed pieces of the page (elements with an id, swapped in by id)
+// or with an X-Redirect header when the whole page changes. Without
+// JavaScript the form is submitted normally.
+//
+// The actions aren't idempotent (an attack is a combat turn), so a failed
+// fetch is never sent again: the server may already have applied it. The page
+// is reloaded instead, which shows whatever state the server ended up in.
+document.addEventListener('submit', async function (event) {
+    const form = event.target;
+    if (!form.hasAttribute('data-fragments') || !window.fetch) {
+        return;
+    }
+    event.preventDefault();
+    const buttons = form.querySelectorAll('button');
+    buttons.forEach(function (button) { button.disabled = true; });
+
+    let response;
+    try {
+        response = await fetch(form.action, {
+            method: 'POST',
+            body: new FormData(form),
+            headers: {'X-Fragments': '1'},
+            credentials: 'same-origin',
+        });
+    } catch (error) {
+        // No answer - maybe not even sent, maybe already applied
+        window.location.reload();
+        return;
+    }
+
+    const location = response.headers.get('X-Redirect');
+    if (location) {
+        window.location.assign(location);
+        return;
+    }
+    if (!response.ok) {
+        // Busy, rate limited or failed halfway - show the real state
+        window.location.reload();
+        return;
+    }
+
+    try {
+        const template = document.createElement('template');
+        template.innerHTML = await response.text();
+        Array.from(template.content.children).forEach(function (fragment) {
+            const current = fragment.id && document.getElementById(fragment.id);
+            if (current) {
+                current.replaceWith(fragment);
+            }
+        });
+    } catch (error) {
+        window.location.reload();
+        return;
+    }
+    buttons.forEach(function (button) { button.disabled = false; });
+});
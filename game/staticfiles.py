@@ -0,0 +1,107 @@
+# ===== STATIC FILES =====
+# collectstatic writes content-hashed copies of every stylesheet (plus .gz and,
+# when the brotli package is installed, .br variants next to them). Because a
+# hashed name never changes content it can be cached by browsers forever.
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.json', '.html')
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+FOREVER = 60 * 60 * 24 * 365
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(COMPRESS_EXTENSIONS):
+                self._write_compressed(self.path(hashed_name))
+
+    def _write_compressed(self, path):
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content)
+
+        for suffix, compressed in variants.items():
+            # Not worth it for tiny files that don't shrink
+            if len(compressed) < len(content):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+
+def accepted_codings(header):
+    """{coding: q} from an Accept-Encoding header. q=0 means "not this one"."""
+    codings = {}
+    for part in header.split(','):
+        name, *params = [piece.strip() for piece in part.split(';')]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[name.lower()] = q
+    return codings
+
+
+def serve(request, path):
+    """Serve collected static files in production with far-future caching.
+
+    Picks the precompressed variant the browser accepts. Only hashed names get
+    the immutable header, anything else may still change under the same URL.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    accepted = accepted_codings(request.headers.get('Accept-Encoding', ''))
+    # The browser's highest q wins, brotli on a tie; "*" stands for the codings it didn't name
+    candidates = [
+        (accepted.get(name, accepted.get('*', 0)), -rank, name, suffix)
+        for rank, (name, suffix) in enumerate((('br', '.br'), ('gzip', '.gz')))
+    ]
+    encoding = None
+    for q, _, name, suffix in sorted(candidates, reverse=True):
+        if q > 0 and os.path.isfile(full_path + suffix):
+            full_path += suffix
+            encoding = name
+            break
+
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+
+    if HASHED_NAME.search(path):
+        response.headers['Cache-Control'] = f'public, max-age={FOREVER}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
@@ -0,0 +1,65 @@
+# Tiny in-process background runner for work that should not block a request
+# (pre-generating content, topping up pools, ...).
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from . import admission
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="game-bg")
+_in_flight = set()
+_lock = threading.Lock()
+
+
+def submit_once(key, func, *args, **kwargs):
+    """Run func in the background unless a job with the same key is already running."""
+    with _lock:
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+
+    def run(inline=False):
+        try:
+            # Players waiting on a page always go before pre-generation
+            admission.background(func)(*args, **kwargs)
+        except Exception:
+            logger.exception("Background job %s failed", key)
+        finally:
+            # Threads get their own DB connection, make sure it doesn't leak
+            if not inline:
+                connection.close()
+            with _lock:
+                _in_flight.discard(key)
+
+    if settings.BACKGROUND_TASKS_INLINE:
+        run(inline=True)
+    else:
+        _executor.submit(run)
+    return True
+
+
+@contextmanager
+def claim(key, wait=0, timeout=60):
+    """Claim key for the block, yields whether we got it.
+
+    Like submit_once, but through the cache so other processes see it too.
+    With wait, keeps trying that many seconds while someone else holds it."""
+    cache = caches[settings.PAGE_CACHE_ALIAS]
+    deadline = time.monotonic() + wait
+    claimed = cache.add(key, 1, timeout)
+    while not claimed and time.monotonic() < deadline:
+        time.sleep(0.05)
+        claimed = cache.add(key, 1, timeout)
+    try:
+        yield claimed
+    finally:
+        if claimed:
+            cache.delete(key)
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.html import format_html
+
+from .. import idempotency
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_key():
+    """Hidden field with a fresh key for an @idempotent form (see game/idempotency.py)."""
+    return format_html('<input type="hidden" name="{}" value="{}">', idempotency.FIELD, idempotency.new_key())
@@ -1,3 +1,291 @@
-from django.test import TestCase
+import asyncio
+import random
+import time
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponseRedirect
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+
+from . import admission, content_pack, idempotency, leaderboard, quest_board, shop, world_map
+from .bands import level_band
+from .models import Character, Item, LeaderboardEntry, Location, Quest, Route
+from .spawns import AliasTable
+
+
+class CacheTestCase(TestCase):
+    # Versions, claims and idempotency keys all live in the cache
+    def setUp(self):
+        caches['default'].clear()
+
+
+# ===== LEADERBOARD =====
+class LeaderboardTests(CacheTestCase):
+    def hero(self, name, level=1, xp=0):
+        hero = Character.objects.create(name=name, level=level, xp=xp)
+        leaderboard.record(hero)
+        return hero
+
+    def ranking(self):
+        return list(LeaderboardEntry.objects.order_by('rank').values_list('character__name', 'rank'))
+
+    def test_new_heroes_are_ranked_by_level_then_xp(self):
+        self.hero("low")
+        self.hero("high", level=3)
+        self.hero("middle", level=3, xp=-1)
+        self.assertEqual(self.ranking(), [("high", 1), ("middle", 2), ("low", 3)])
+
+    def test_ties_go_to_the_older_hero(self):
+        self.hero("first", level=2)
+        self.hero("second", level=2)
+        self.assertEqual(self.ranking(), [("first", 1), ("second", 2)])
+
+    def test_hero_moves_up_and_down(self):
+        a, b, c = self.hero("a", level=3), self.hero("b", level=2), self.hero("c", level=1)
+        c.level = 4
+        leaderboard.record(c)
+        self.assertEqual(self.ranking(), [("c", 1), ("a", 2), ("b", 3)])
+
+        a.level = 1
+        leaderboard.record(a)
+        self.assertEqual(self.ranking(), [("c", 1), ("b", 2), ("a", 3)])
+
+    def test_deleting_a_hero_closes_the_gap(self):
+        self.hero("a", level=3)
+        middle = self.hero("b", level=2)
+        self.hero("c", level=1)
+        middle.delete()
+        self.assertEqual(self.ranking(), [("a", 1), ("c", 2)])
+
+    def test_rebuild_matches_incremental_ranks(self):
+        for name, level, xp in [("a", 2, 5), ("b", 5, 0), ("c", 2, 9), ("d", 1, 0)]:
+            self.hero(name, level=level, xp=xp)
+        incremental = self.ranking()
+        leaderboard.rebuild()
+        self.assertEqual(self.ranking(), incremental)
+
+
+# ===== IDEMPOTENT POSTS =====
+class IdempotencyTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.runs = 0
+
+        @idempotency.idempotent
+        def view(request, char_id, item_id):
+            self.runs += 1
+            return HttpResponseRedirect(f'/game/shop/{char_id}/?run={self.runs}')
+        self.view = view
+
+    def post(self, key, path='/game/buy-item/1/2'):
+        request = RequestFactory().post(path, {idempotency.FIELD: key})
+        request.resolver_match = resolve(path)
+        return self.view(request, **request.resolver_match.kwargs)
+
+    def test_repeat_replays_the_first_redirect(self):
+        key = idempotency.new_key()
+        first = self.post(key)
+        second = self.post(key)
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second['Location'], first['Location'])
+
+    def test_new_key_runs_again(self):
+        self.post(idempotency.new_key())
+        self.post(idempotency.new_key())
+        self.assertEqual(self.runs, 2)
+
+    def test_same_key_for_another_item_runs_again(self):
+        key = idempotency.new_key()
+        self.post(key)
+        self.post(key, path='/game/buy-item/1/3')
+        self.assertEqual(self.runs, 2)
+
+    def test_post_without_key_always_runs(self):
+        self.post('')
+        self.post('not-a-uuid')
+        self.assertEqual(self.runs, 2)
+
+    @override_settings(IDEMPOTENCY_SYNC_WAIT_SECONDS=0)
+    def test_repeat_while_running_gets_busy_at_once(self):
+        key = idempotency.new_key()
+        request = RequestFactory().post('/game/buy-item/1/2', {idempotency.FIELD: key})
+        request.resolver_match = resolve('/game/buy-item/1/2')
+        caches['default'].add(idempotency._cache_key(request), idempotency.IN_PROGRESS)
+
+        started = time.monotonic()
+        response = self.post(key)
+        self.assertEqual(response.status_code, 409)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.runs, 0)
+
+
+# ===== QUEST BOARD AND SHOP =====
+# No content pack and no AI service: everything comes from the formulas
+@mock.patch.object(content_pack, 'draw', lambda kind, band, count=1: [])
+@mock.patch('game.ai_service.generate_quests', return_value=[])
+class QuestBoardTests(CacheTestCase):
+    band = level_band(1)
+
+    def test_first_visit_fills_the_board(self, generate_quests):
+        pool = quest_board.fill_empty_band(self.band)
+        self.assertEqual(len(pool), settings.QUEST_POOL_DEPTH)
+        generate_quests.assert_not_called()
+
+    def test_second_visit_does_not_fill_again(self, generate_quests):
+        quest_board.fill_empty_band(self.band)
+        pool = quest_board.fill_empty_band(self.band)
+        self.assertEqual(len(pool), settings.QUEST_POOL_DEPTH)
+        self.assertEqual(quest_board.band_pool(self.band).count(), settings.QUEST_POOL_DEPTH)
+
+    def test_top_up_replaces_claimed_quests(self, generate_quests):
+        quest_board.fill_empty_band(self.band)
+        hero = Character.objects.create(name="hero")
+        quest_board.band_pool(self.band).filter(pk__in=quest_board.band_pool(self.band)[:2]).update(assigned_to=hero)
+
+        added = quest_board.top_up(self.band)
+        self.assertEqual(len(added), 2)
+        self.assertEqual(quest_board.band_pool(self.band).count(), settings.QUEST_POOL_DEPTH)
+
+    def test_top_up_of_a_full_board_adds_nothing(self, generate_quests):
+        quest_board.fill_empty_band(self.band)
+        self.assertEqual(quest_board.top_up(self.band), [])
+        self.assertEqual(Quest.objects.count(), settings.QUEST_POOL_DEPTH)
+
+    def test_board_held_by_someone_else_is_left_alone(self, generate_quests):
+        with quest_board._filling(self.band) as claimed, mock.patch.object(quest_board, 'FILL_WAIT_SECONDS', 0):
+            self.assertTrue(claimed)
+            with self.assertLogs('game.quest_board', 'WARNING'):
+                self.assertEqual(quest_board.top_up(self.band), [])
+        self.assertEqual(Quest.objects.count(), 0)
+
+
+@mock.patch.object(content_pack, 'draw', lambda kind, band, count=1: [])
+class ShopTests(CacheTestCase):
+    band = level_band(1)
+
+    def test_empty_shelf_is_stocked_once(self):
+        first = shop.stock_empty_band(self.band)
+        second = shop.stock_empty_band(self.band)
+        self.assertEqual(len(first), settings.SHOP_ITEMS_PER_BAND)
+        self.assertEqual(len(second), settings.SHOP_ITEMS_PER_BAND)
+        self.assertEqual(Item.objects.filter(is_in_shop=True).count(), settings.SHOP_ITEMS_PER_BAND)
+
+    def test_shelf_being_stocked_elsewhere_is_not_stocked_again(self):
+        with shop._stocking(self.band), mock.patch.object(shop, 'STOCKING_WAIT_SECONDS', 0):
+            self.assertEqual(shop.stock_empty_band(self.band), [])
+        self.assertEqual(Item.objects.count(), 0)
+
+
+# ===== ADMISSION =====
+@override_settings(AI_MAX_CONCURRENT_CALLS=1, AI_INTERACTIVE_RESERVED_CALLS=0, AI_MAX_QUEUED_CALLS=4)
+class AdmissionTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(admission, 'gate', admission.Gate())
+        self.gate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_aslot_holds_and_releases(self):
+        async def hold():
+            async with admission.aslot(timeout=1):
+                return self.gate.stats()
+        self.assertEqual(asyncio.run(hold()), (1, 0))
+        self.assertEqual(self.gate.stats(), (0, 0))
+
+    def test_cancelled_waiter_gives_its_slot_back(self):
+        async def use_slot():
+            async with admission.aslot(timeout=5):
+                pass
+
+        async def cancel_waiter():
+            # Hold the only slot so the next caller has to queue
+            self.gate.acquire(admission.INTERACTIVE, timeout=1)
+            task = asyncio.ensure_future(use_slot())
+            while self.gate.stats() != (1, 1):
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            # The parked thread still gets the slot once it's free and must hand it straight back
+            self.gate.release()
+            deadline = time.monotonic() + 2
+            while self.gate.stats() != (0, 0) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            return self.gate.stats()
+
+        self.assertEqual(asyncio.run(cancel_waiter()), (0, 0))
+
+    def test_full_queue_is_refused(self):
+        with override_settings(AI_MAX_QUEUED_CALLS=0), admission.slot(timeout=1):
+            with self.assertRaises(admission.QueueFull):
+                with admission.slot(timeout=1):
+                    pass
+
+
+# ===== SPAWN TABLES =====
+class AliasTableTests(SimpleTestCase):
+    def test_draws_follow_the_weights(self):
+        random.seed(7)
+        table = AliasTable(['common', 'rare', 'never'], [9, 1, 0])
+        counts = Counter(table.sample() for _ in range(20000))
+        self.assertNotIn('never', counts)
+        self.assertAlmostEqual(counts['rare'] / 20000, 0.1, delta=0.02)
+
+    def test_single_item(self):
+        self.assertEqual(AliasTable(['only'], [3]).sample(), 'only')
+
+
+# ===== WORLD MAP =====
+class WorldMapTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(world_map, '_map', world_map.WorldMap())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.a, self.b, self.c, self.d = (Location.objects.create(name=name, description="") for name in "ABCD")
+
+    def road(self, start, end, cost):
+        # Map versions are bumped on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return Route.objects.create(start=start, end=end, cost=cost)
+
+    def test_cheapest_route_and_unreachable(self):
+        self.road(self.a, self.b, 5)
+        self.road(self.b, self.c, 5)
+        self.road(self.a, self.c, 20)
+        self.assertEqual(world_map.travel_cost(self.a.id, self.c.id), 10)
+        self.assertEqual(world_map.travel_cost(self.c.id, self.a.id), 10)
+        self.assertIsNone(world_map.travel_cost(self.a.id, self.d.id))
+
+    def test_new_road_updates_known_costs(self):
+        self.road(self.a, self.b, 5)
+        self.road(self.b, self.c, 5)
+        self.assertEqual(world_map.travel_cost(self.a.id, self.c.id), 10)
+
+        self.road(self.a, self.c, 3)
+        self.road(self.c, self.d, 1)
+        self.assertEqual(world_map.travel_cost(self.a.id, self.c.id), 3)
+        self.assertEqual(world_map.travel_cost(self.a.id, self.d.id), 4)
+        self.assertEqual(world_map.travel_cost(self.b.id, self.d.id), 6)
+
+    def test_removed_road_is_routed_around(self):
+        self.road(self.a, self.b, 5)
+        self.road(self.b, self.c, 5)
+        shortcut = self.road(self.a, self.c, 3)
+        self.assertEqual(world_map.travel_cost(self.a.id, self.c.id), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            shortcut.delete()
+        self.assertEqual(world_map.travel_cost(self.a.id, self.c.id), 10)
+
+    def test_reachable_is_sorted_by_cost(self):
+        self.road(self.a, self.b, 7)
+        self.road(self.a, self.c, 2)
+        self.assertEqual(
+            world_map.reachable(self.a.id),
+            [(self.c.id, "C", 2), (self.b.id, "B", 7)],
+        )
@@ -1,13 +1,16 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest, Http404, StreamingHttpResponse
 # This imports the Character model so the view can look at the data
 from .models import Character, Quest, Item, Location, Enemy
 # 'get_object_or_404' to help us find a specific character or show an error if they don't exist
 from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.views.decorators.http import require_POST
-import requests
 from random import randrange
-import json, re 
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils import timezone
+from . import admission, ai_service, api, combat_log, content_pack, exports, fragments, idempotency, leaderboard, metrics as game_metrics, page_cache, quest_board, shop, spawns, world_map
+from .bands import level_band
 
 def main_menu(request):
     return render(request, 'game/main_menu.html')
@@ -53,6 +56,7 @@ def level_up(request, char_id):
     hero.max_health += 20
     hero.strength += 10
     hero.save()
+    leaderboard.record(hero)
     
     # Instead of HttpResponse, we send them to the 'character_detail' view
     # We pass the hero's ID so it knows which profile to show
@@ -80,84 +84,84 @@ def recover_health(request, char_id, quest_id):
     return redirect('quest_detail', char_id=hero.id, quest_id=quest.id)
 
 def quest_log(request, char_id):
-    hero = get_object_or_404(Character, pk=char_id)
-    active_quests = Quest.objects.filter(assigned_to=hero, is_completed=False)
-    completed_quests = Quest.objects.filter(assigned_to=hero, is_completed=True)
-    available_quests = Quest.objects.filter(assigned_to__isnull=True)
-
-    # Auto-generate if board is empty
-    if not available_quests.exists():
-        return refresh_quests(request, char_id)
-
-    return render(request, 'game/quest_log.html', {
-        'hero': hero,
-        'active_quests': active_quests,
-        'completed_quests': completed_quests,
-        'available_quests': available_quests,
-    })
-
+    def build_hero_part():
+        hero = get_object_or_404(Character, pk=char_id)
+        quests = list(Quest.objects.filter(assigned_to=hero).prefetch_related('enemies'))
+        return {
+            'hero': hero,
+            'active_quests': [q for q in quests if not q.is_completed],
+            'completed_quests': [q for q in quests if q.is_completed],
+        }
+
+    context = dict(page_cache.hero_cached(char_id, 'quest_log', build_hero_part))
+    band = level_band(context['hero'].level)
+
+    # The board is shared by the whole band, so it is cached per band
+    available_quests = page_cache.band_cached(band, 'quest_board', lambda: list(quest_board.band_pool(band)))
+
+    if not available_quests:
+        # No pool for this band yet - write one from the formulas so nobody waits,
+        # the AI quests arrive with the next background top-up. Done outside the
+        # cached builder: the write bumps the band version the board is cached under.
+        available_quests = quest_board.fill_empty_band(band)
+    context['available_quests'] = available_quests
+
+    return render(request, 'game/quest_log.html', context)
+
+@admission.rate_limited
 def refresh_quests(request, char_id):
     hero = get_object_or_404(Character, pk=char_id)
-    Quest.objects.filter(assigned_to__isnull=True).delete()
-    
-    try:
-        response = requests.post(
-            "http://localhost:8001/generate-quests/", 
-            json={"player_level": hero.level},
-            timeout=60
-        )
-        if response.status_code == 200:
-            ai_raw = response.json().get("response", "[]")
-            # Regex to ensure we only get the JSON array
-            json_match = re.search(r'\[.*\]', ai_raw, re.DOTALL)
-            if json_match:
-                quests = json.loads(json_match.group())
-                for q in quests:
-                    Quest.objects.create(
-                        title=q.get('title', 'Unknown Task'),
-                        description=q.get('description', 'No description provided.'),
-                        xp_reward=int(q.get('xp_reward', 50)),
-                        assigned_to=None
-                    )
-    except Exception as e:
-        print(f"Quest Generation Failed: {e}")
+    band = level_band(hero.level)
+
+    # Only ever touch this hero's band - other players' boards stay untouched
+    quest_board.refresh(band)
+    quest_board.schedule_top_up(band)
         
     return redirect('quest_log', char_id=hero.id)
 
+@idempotency.idempotent
+@admission.rate_limited
 def assign_quest(request, char_id, quest_id):
     hero = get_object_or_404(Character, pk=char_id)
     quest = get_object_or_404(Quest, pk=quest_id)
     
     if request.method == "POST":
+        # The pool is shared by the whole band, so only claim the quest if nobody beat us to it
+        claimed = Quest.objects.filter(pk=quest.id, assigned_to__isnull=True).update(assigned_to=hero, updated_at=timezone.now())
+        if not claimed:
+            messages.error(request, "That quest has already been taken.")
+            return redirect('quest_log', char_id=hero.id)
         quest.assigned_to = hero
-        quest.save()
+
+        # update() skips the signals, so invalidate the cached pages by hand
+        page_cache.bump_hero(hero.id)
+        page_cache.bump_band(quest.level_band)
+
+        # Replace the claimed quest in the background
+        quest_board.schedule_top_up(quest.level_band)
         
         # We generate 3 separate enemies to ensure they are distinct DB records
         for _ in range(3):
             try:
                 # Re-using the logic: Passing quest title as the 'context'
-                response = requests.post(
-                    "http://localhost:8001/generate-enemy/", 
-                    json={
-                        "player_level": hero.level,
-                        "context": f"Quest: {quest.title}" # Guide the AI
-                    },
-                    timeout=90
+                data = content_pack.enemy(hero.level) or ai_service.generate_enemy(
+                    fallback=True,
+                    player_level=hero.level,
+                    context=f"Quest: {quest.title}" # Guide the AI
+                )
+                Enemy.objects.create(
+                    name=data['name'],
+                    health=data['health'],
+                    attack_power=data['attack_power'],
+                    xp_reward=data['xp_reward'],
+                    quest=quest # Crucial: Link to the quest
                 )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    Enemy.objects.create(
-                        name=data['name'],
-                        health=int(data['health']),
-                        attack_power=int(data['attack_power']),
-                        xp_reward=int(data['xp_reward']),
-                        quest=quest # Crucial: Link to the quest
-                    )
             except Exception as e:
                 print(f"Failed to generate quest enemy: {e}")
 
         return redirect('quest_detail', char_id=hero.id, quest_id=quest.id)
+
+    return redirect('quest_log', char_id=hero.id)
     
 def quest_detail(request, char_id, quest_id):
     hero = get_object_or_404(Character, pk=char_id)
@@ -204,6 +208,7 @@ def complete_quest(request, char_id, quest_id):
             
         hero.save()
         quest.save()
+        leaderboard.record(hero)
         messages.success(request, f"Quest Complete! You earned {quest.xp_reward} XP.")
 
     return redirect('quest_log', char_id=hero.id)
@@ -214,9 +219,20 @@ def travel(request, char_id, loc_id):
     hero = get_object_or_404(Character, pk=char_id)
     destination = get_object_or_404(Location, pk=loc_id)
     
-    # 2. Update the hero's position
+    # 2. Pay for the cheapest way there
+    cost = world_map.travel_cost(hero.current_location_id, destination.id)
+    if cost is None:
+        messages.error(request, f"No road leads to {destination.name}.")
+        return redirect('character_detail', char_id=hero.id)
+    if hero.gold_amount < cost:
+        messages.error(request, f"The journey to {destination.name} costs {cost} gold.")
+        return redirect('character_detail', char_id=hero.id)
+
+    # 3. Update the hero's position
+    hero.gold_amount -= cost
     hero.current_location = destination
     hero.save()
+    messages.success(request, f"You travelled to {destination.name} for {cost} gold.")
     
     return redirect('character_detail', char_id=hero.id)
 
@@ -225,31 +241,38 @@ def create_character(request):
         name = request.POST.get('name')
         if name:
             # Create the character and save to DB
-            Character.objects.create(name=name)
+            hero = Character.objects.create(name=name)
+            leaderboard.record(hero)
             return redirect('characters_listing')
     
     return render(request, 'game/create_character.html')
 
 def character_detail(request, char_id):
-    hero = get_object_or_404(Character, pk=char_id)
-    
-    # 1. Get all items owned by the hero
-    all_items = hero.items.all()
-    
-    # 2. Filter for active Gear (only equipped items)
-    gear_slots = {
-        slot: all_items.filter(item_type=slot, is_equipped=True).first()
-        for slot in ['HEAD', 'CHEST', 'GLOVES', 'FEET', 'WEAPON', 'RING', 'AMULET']
-    }
-    
-    # 3. Filter for the Bag (only items NOT equipped)
-    bag_items = all_items.filter(is_equipped=False)
-    
-    return render(request, 'game/character_detail.html', {
-        'hero': hero,
-        'gear': gear_slots,
-        'bag_items': bag_items
-    })
+    def build():
+        hero = get_object_or_404(Character.objects.select_related('current_location'), pk=char_id)
+        
+        # 1. Get all items owned by the hero (one query, split up below)
+        all_items = list(hero.items.all())
+        
+        # 2. Filter for active Gear (only equipped items)
+        gear_slots = {slot: None for slot in ['HEAD', 'CHEST', 'GLOVES', 'FEET', 'WEAPON', 'RING', 'AMULET']}
+        for item in all_items:
+            if item.is_equipped and item.item_type in gear_slots and gear_slots[item.item_type] is None:
+                gear_slots[item.item_type] = item
+        
+        # 3. Filter for the Bag (only items NOT equipped)
+        bag_items = [item for item in all_items if not item.is_equipped]
+        
+        return {
+            'hero': hero,
+            'gear': gear_slots,
+            'bag_items': bag_items
+        }
+
+    context = page_cache.hero_cached(char_id, 'character_detail', build)
+    # Not cached with the page: the map keeps it in memory and changes on its own
+    destinations = world_map.reachable(context['hero'].current_location_id)
+    return render(request, 'game/character_detail.html', {**context, 'destinations': destinations})
 
 def rename_hero(request, char_id, new_name):
     hero = get_object_or_404(Character, pk=char_id)
@@ -276,12 +299,15 @@ def start_battle(request, char_id, enemy_id):
 def attack_enemy(request, char_id):
     hero = get_object_or_404(Character, pk=char_id)
     enemy = hero.current_enemy
+    # The page's script wants only what changed (see game/fragments.py)
+    partial = fragments.wanted(request)
 
     if request.method == "POST" and enemy:
         # 1. Hero Attacks
         hero_strength = getattr(hero, 'strength', 10)
         enemy.health -= hero_strength
         enemy.save()
+        combat_log.record(combat_log.Kind.ATTACK, hero.id, enemy.id, hero_strength)
 
         # 2. Check for Victory
         if enemy.health <= 0:
@@ -293,6 +319,8 @@ def attack_enemy(request, char_id):
             hero.xp += enemy.xp_reward
             gold_loot = randrange(5, 20)
             hero.gold_amount += gold_loot
+            combat_log.record(combat_log.Kind.VICTORY, hero.id, enemy.id, enemy.xp_reward)
+            combat_log.record(combat_log.Kind.LOOT, hero.id, enemy.id, gold_loot)
             
             # Level Up Logic
             if hero.xp >= 100:
@@ -300,16 +328,18 @@ def attack_enemy(request, char_id):
                 hero.xp -= 100
                 hero.strength += 10
                 hero.max_health += 15
+                combat_log.record(combat_log.Kind.LEVEL_UP, hero.id, enemy.id, hero.level)
             
             # Clear fight state
             hero.current_enemy = None
             hero.save()
+            leaderboard.record(hero)
 
             # --- INNOVATIVE REDIRECT LOGIC ---
+            message = f"Victory! {enemy.name} was defeated."
             if enemy.quest:
-                messages.success(request, f"Victory! {enemy.name} was defeated.")
                 # Redirect back to the quest tracker
-                return redirect('quest_detail', char_id=hero.id, quest_id=enemy.quest.id)
+                location = reverse('quest_detail', args=[hero.id, enemy.quest.id])
             else:
                 # Fallback for random encounters
                 request.session['last_victory'] = {
@@ -319,28 +349,62 @@ def attack_enemy(request, char_id):
                 }
                 # If it's a random enemy, you CAN delete it or keep it marked as is_defeated
                 # For quests, we definitely keep it.
-                return redirect('battle_arena', char_id=hero.id, enemy_id=0)
+                location = reverse('battle_arena', args=[hero.id, 0])
+            if partial:
+                return fragments.respond(request, None, None, {
+                    'outcome': 'victory', 'message': message, 'gold_loot': gold_loot,
+                    'hero': api.hero_state(hero), 'enemy': api.enemy_state(enemy),
+                }, location)
+            if enemy.quest:
+                messages.success(request, message)
+            return redirect(location)
 
         # 3. Enemy Attacks Back
         hero.health -= enemy.attack_power
         hero.save()
+        combat_log.record(combat_log.Kind.DAMAGE, hero.id, enemy.id, enemy.attack_power)
 
         # 4. Check for Hero Death
         if hero.health <= 0:
             hero.health = 0
+            combat_log.record(combat_log.Kind.DEFEAT, hero.id, enemy.id)
             hero.current_enemy = None
             hero.save()
-            messages.error(request, "You have been defeated and retreated to town.")
+            message = "You have been defeated and retreated to town."
+            if partial:
+                return fragments.respond(request, None, None, {
+                    'outcome': 'defeat', 'message': message,
+                    'hero': api.hero_state(hero), 'enemy': api.enemy_state(enemy),
+                }, reverse('character_detail', args=[hero.id]))
+            messages.error(request, message)
             return redirect('character_detail', char_id=hero.id)
 
+        if partial:
+            # Only the HP bars and the message change, the rest of the page stays
+            message = f"You hit {enemy.name} for {hero_strength}. It hits back for {enemy.attack_power}."
+            return fragments.respond(request, 'game/partials/attack_result.html', {
+                'hero': hero, 'enemy': enemy, 'message': message,
+            }, {
+                'outcome': 'hit', 'message': message,
+                'hero': api.hero_state(hero), 'enemy': api.enemy_state(enemy),
+            })
         return redirect('battle_arena', char_id=hero.id, enemy_id=enemy.id)
 
+    if partial:
+        return fragments.respond(request, None, None, {
+            'outcome': 'none', 'message': "There is nobody to fight.",
+            'hero': api.hero_state(hero), 'enemy': None,
+        }, reverse('battle_arena', args=[hero.id, 0]))
     return redirect('battle_arena', char_id=hero.id, enemy_id=0)
 
 def select_enemy(request, char_id):
     hero = get_object_or_404(Character, pk=char_id)
-    # Get all monsters currently in the database
-    available_enemies = Enemy.objects.all() 
+    # Only the monsters roaming where the hero is (enemy_location_idx)
+    available_enemies = Enemy.objects.filter(
+        location_id=hero.current_location_id,
+        is_defeated=False,
+        quest__isnull=True,
+    )
     
     return render(request, 'game/select_enemy.html', {
         'hero': hero,
@@ -349,53 +413,70 @@ def select_enemy(request, char_id):
 
 # game/views.py
 def battle_arena(request, char_id, enemy_id):
-    hero = get_object_or_404(Character, pk=char_id)
     victory_data = None
-    enemy = None
+
+    def build():
+        hero = get_object_or_404(Character, pk=char_id)
+        enemy = None
+
+        if enemy_id != 0:
+            # Fetch the specific enemy
+            enemy = get_object_or_404(Enemy, pk=enemy_id)
+
+        return {'hero': hero, 'enemy': enemy}
+
+    # build() only reads - a write in there would bump the version it is cached under
+    context = page_cache.hero_cached(char_id, 'battle_arena', build, enemy_id)
+
+    # Sync the hero's current_enemy field just in case. A cached hero is as
+    # current as its version, so this only writes when the fight really changes.
+    enemy = context['enemy']
+    if enemy is not None and context['hero'].current_enemy_id != enemy.id:
+        Character.objects.filter(pk=char_id).update(current_enemy=enemy, updated_at=timezone.now())
+        page_cache.bump_hero(char_id)
 
     if enemy_id == 0:
         # Check if we just won
         victory_data = request.session.pop('last_victory', None)
         # If there's no victory data and no enemy, the page will look empty
-    else:
-        # Fetch the specific enemy
-        enemy = get_object_or_404(Enemy, pk=enemy_id)
-        
-        # Sync the hero's current_enemy field just in case
-        if hero.current_enemy != enemy:
-            hero.current_enemy = enemy
-            hero.save()
 
     return render(request, 'game/battle_arena.html', {
-        'hero': hero,
-        'enemy': enemy,
+        **context,
         'victory': victory_data
     })
 
+@idempotency.idempotent
+@admission.rate_limited
 def generate_new_enemy(request, char_id):
     if request.method != "POST":
         return redirect('character_detail', char_id=char_id)
 
-    hero = get_object_or_404(Character, pk=char_id)
-    ai_service_url = "http://localhost:8001/generate-enemy/"
+    hero = get_object_or_404(Character.objects.select_related('current_location'), pk=char_id)
+    location = hero.current_location
     
     try:
         print(f"Requesting AI for Hero {hero.id}...")
-        response = requests.post(ai_service_url, json={
-            "player_level": hero.level, 
-            "environment": "Arena", 
-            "player_health": hero.max_health, 
-            "player_strength": hero.strength
-            }, timeout=90)
-        data = response.json()
+        # The location's spawn table first, then the content pack, then the AI
+        data = (
+            spawns.spawn(hero.current_location_id, hero.level, hero.max_health, hero.strength)
+            or content_pack.enemy(hero.level, hero.max_health, hero.strength)
+            or ai_service.generate_enemy(
+                fallback=True,
+                player_level=hero.level, 
+                environment=location.name if location else "Arena", 
+                player_health=hero.max_health, 
+                player_strength=hero.strength
+            )
+        )
         
         # Create the enemy
         new_enemy = Enemy.objects.create(
             name=data['name'],
             level=data['level'],
-            health=int(data['health']),
-            attack_power=int(data['attack_power']),
-            xp_reward=int(data.get('xp_reward', 10))
+            health=data['health'],
+            attack_power=data['attack_power'],
+            xp_reward=data['xp_reward'],
+            location=location
         )
         
         print(f"Enemy Created: {new_enemy.name} (ID: {new_enemy.id})")
@@ -410,42 +491,25 @@ def generate_new_enemy(request, char_id):
     
 def shop_page(request, char_id):
     hero = get_object_or_404(Character, pk=char_id)
+    band = level_band(hero.level)
     
-    # Check if the shop already has items
-    shop_items = Item.objects.filter(is_in_shop=True)
+    # Every level band has its own pre-generated shelf
+    shop_items = list(shop.band_stock(band))
     
-    if not shop_items.exists():
-        try:
-            response = requests.post(
-                "http://localhost:8001/generate-shop-items/",
-                json={"player_level": hero.level},
-                timeout=120
-            )
-            if response.status_code == 200:
-                raw_content = response.json().get("response", "[]")
-                json_match = re.search(r'\[.*\]', raw_content, re.DOTALL)
-                
-                if json_match:
-                    ai_items = json.loads(json_match.group())
-                    for data in ai_items:
-                        Item.objects.create(
-                            name=data.get('name', 'Relic'),
-                            item_type=data.get('item_type', 'WEAPON').upper(), # Force uppercase to match choices
-                            health_bonus=data.get('health_bonus', 0),
-                            power_bonus=data.get('power_bonus', 0),
-                            price=data.get('price', 50),
-                            is_in_shop=True
-                        )
-                    # Refresh queryset after creation
-                    shop_items = Item.objects.filter(is_in_shop=True)
-        except Exception as e:
-            print(f"Shop population failed: {e}")
+    if not shop_items:
+        # Nothing pre-generated yet - stock the shelf from the formulas right away
+        # instead of making the hero wait for the AI
+        shop_items = shop.stock_empty_band(band)
+    elif shop.is_stale(shop_items):
+        # Keep serving the old stock while the new shipment is generated
+        shop.schedule_rotation(band)
 
     return render(request, 'game/shop_page.html', {
         'hero': hero,
         'shop_items': shop_items
     })
 
+@idempotency.idempotent
 def buy_item(request, char_id, item_id):
     hero = get_object_or_404(Character, pk=char_id)
     item = get_object_or_404(Item, pk=item_id)
@@ -480,13 +544,17 @@ def equip_item(request, char_id, item_id):
             owner=hero, 
             item_type=item_to_equip.item_type, 
             is_equipped=True
-        ).update(is_equipped=False)
+        ).update(is_equipped=False, updated_at=timezone.now())
+        # (the save below bumps the hero's page cache version)
 
         # 2. Equip the new item
         item_to_equip.is_equipped = True
         item_to_equip.save()
         
-        messages.success(request, f"Equipped {item_to_equip.name} to {item_to_equip.item_type} slot.")
+        message = f"Equipped {item_to_equip.name} to {item_to_equip.item_type} slot."
+        if fragments.wanted(request):
+            return _gear_response(request, hero, item_to_equip.item_type, message)
+        messages.success(request, message)
 
     return redirect('character_detail', char_id=hero.id)
 
@@ -497,6 +565,63 @@ def unequip_item(request, char_id, item_id):
     if request.method == "POST":
         item.is_equipped = False
         item.save()
-        messages.info(request, f"Unequipped {item.name}.")
+        message = f"Unequipped {item.name}."
+        if fragments.wanted(request):
+            return _gear_response(request, hero, item.item_type, message)
+        messages.info(request, message)
         
-    return redirect('character_detail', char_id=hero.id)
\ No newline at end of file
+    return redirect('character_detail', char_id=hero.id)
+
+def _gear_response(request, hero, slot, message):
+    # The changed gear slot and the bag, the rest of character_detail stays as it is
+    all_items = list(hero.items.all())
+    equipped = next((item for item in all_items if item.is_equipped and item.item_type == slot), None)
+    bag_items = [item for item in all_items if not item.is_equipped]
+    return fragments.respond(request, 'game/partials/gear_result.html', {
+        'hero': hero,
+        'label': Item.ItemType(slot).label,
+        'item': equipped,
+        'bag_items': bag_items,
+        'message': message,
+    }, {
+        'message': message,
+        'slot': slot,
+        'equipped': api.item_state(equipped) if equipped else None,
+        'bag': [api.item_state(bag_item) for bag_item in bag_items],
+    })
+
+# ===== LEADERBOARD VIEW =====
+def leaderboard_page(request, char_id=None):
+    hero = None
+    neighbours = []
+    if char_id is not None:
+        hero = get_object_or_404(Character, pk=char_id)
+        neighbours = leaderboard.around(hero.id)
+
+    return render(request, 'game/leaderboard.html', {
+        'hero': hero,
+        'top_entries': leaderboard.top(10),
+        'neighbours': neighbours,
+    })
+
+# ===== METRICS VIEW =====
+def metrics(request):
+    return HttpResponse(game_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ===== EXPORT VIEW =====
+@staff_member_required
+def export_data(request, name, format):
+    # e.g. /game/export/characters.ndjson?since=2026-01-01&min_level=10&max_level=20
+    if name not in exports.EXPORTS or format not in exports.FORMATS:
+        raise Http404("No such export")
+    try:
+        filters = exports.parse_filters(
+            request.GET.get('since'), request.GET.get('min_level'), request.GET.get('max_level')
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    # The rows are fetched chunk by chunk while the response is being sent
+    response = StreamingHttpResponse(exports.stream(name, format, **filters), content_type=exports.FORMATS[format])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{format}"'
+    return response
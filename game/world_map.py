@@ -0,0 +1,178 @@
+# ===== WORLD MAP =====
+# Locations connected by two-way Routes, with the cheapest travel cost between
+# any two of them kept in memory.
+#
+# Every process holds the graph and one row of shortest-path costs per
+# starting location (one Dijkstra run the first time a location is asked
+# about). Afterwards travel_cost() is a dict lookup and reachable() a
+# pre-sorted list, whatever the size of the map.
+#
+# Route and Location changes bump a version in the cache (see signals.py).
+# When a process sees a new version it reloads the edges (two queries), diffs
+# them against its own copy and updates the rows incrementally:
+# - a new or cheaper road can only make routes cheaper, so the improvement is
+#   relaxed outwards from the road's ends and stops where nothing improves
+# - a dearer or removed road only matters to rows whose cheapest route used
+#   it; those rows are dropped and rebuilt on their next use
+import heapq
+import threading
+
+from django.conf import settings
+
+from . import page_cache
+from .models import Location, Route
+
+INFINITY = float('inf')
+
+
+class WorldMap:
+    def __init__(self):
+        self.version = None
+        self.names = {}
+        # {location_id: {neighbour_id: cost}} - both directions
+        self.edges = {}
+        # {start_id: {location_id: cost}} for every start that was asked about
+        self.rows = {}
+        # {start_id: [(cost, name, location_id), ...]} sorted, built from the rows
+        self.sorted_rows = {}
+        self.lock = threading.RLock()
+
+    # ===== LOADING =====
+    def load(self):
+        names = dict(Location.objects.values_list('id', 'name'))
+        edges = {location_id: {} for location_id in names}
+        for start, end, cost in Route.objects.values_list('start_id', 'end_id', 'cost'):
+            # Two roads between the same places: the cheaper one counts
+            if start != end and cost < edges[start].get(end, INFINITY):
+                edges[start][end] = cost
+                edges[end][start] = cost
+        return names, edges
+
+    def sync(self):
+        """Catch up with route/location changes made since the last call."""
+        version = page_cache.map_version()
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            names, edges = self.load()
+            if self.version is None:
+                self.names, self.edges = names, edges
+                self.rows, self.sorted_rows = {}, {}
+            else:
+                self.apply(names, edges)
+            self.version = version
+
+    def apply(self, names, edges):
+        for location_id in set(self.names) - set(names):
+            self.rows.pop(location_id, None)
+            # Its roads are gone too (cascade), the diff below handles those
+        self.names = dict(names)
+        # Names show up in the sorted rows
+        self.sorted_rows.clear()
+
+        old_edges = self.edges
+        self.edges = {location_id: dict(neighbours) for location_id, neighbours in edges.items()}
+        for location_id in names:
+            self.edges.setdefault(location_id, {})
+
+        changed = {}
+        for graph in (old_edges, edges):
+            for start, neighbours in graph.items():
+                for end in neighbours:
+                    if start < end:
+                        old = old_edges.get(start, {}).get(end, INFINITY)
+                        new = edges.get(start, {}).get(end, INFINITY)
+                        if old != new:
+                            changed[(start, end)] = (old, new)
+
+        for (start, end), (old, new) in changed.items():
+            if new > old:
+                self.dropped(start, end, old)
+        for (start, end), (old, new) in changed.items():
+            if new < old:
+                self.cheapened(start, end, new)
+
+    # ===== INCREMENTAL UPDATES =====
+    def dropped(self, a, b, old_cost):
+        for start in list(self.rows):
+            row = self.rows[start]
+            da, db = row.get(a, INFINITY), row.get(b, INFINITY)
+            # Only rows that reached one end through the road can get dearer
+            if da + old_cost == db or db + old_cost == da:
+                del self.rows[start]
+                self.sorted_rows.pop(start, None)
+
+    def cheapened(self, a, b, cost):
+        for start, row in self.rows.items():
+            heap = []
+            for near, far in ((a, b), (b, a)):
+                through = row.get(near, INFINITY) + cost
+                if through < row.get(far, INFINITY):
+                    row[far] = through
+                    heapq.heappush(heap, (through, far))
+            if heap:
+                self.relax(row, heap)
+                self.sorted_rows.pop(start, None)
+
+    def relax(self, row, heap):
+        # Dijkstra that only continues through locations that got cheaper
+        while heap:
+            cost, location_id = heapq.heappop(heap)
+            if cost > row.get(location_id, INFINITY):
+                continue
+            for neighbour, road_cost in self.edges.get(location_id, {}).items():
+                through = cost + road_cost
+                if through < row.get(neighbour, INFINITY):
+                    row[neighbour] = through
+                    heapq.heappush(heap, (through, neighbour))
+
+    # ===== QUERIES =====
+    def row(self, start):
+        row = self.rows.get(start)
+        if row is None:
+            with self.lock:
+                row = self.rows.get(start)
+                if row is None:
+                    row = {start: 0} if start in self.names else {}
+                    self.relax(row, [(0, start)] if row else [])
+                    self.rows[start] = row
+        return row
+
+    def sorted_row(self, start):
+        ranked = self.sorted_rows.get(start)
+        if ranked is None:
+            with self.lock:
+                ranked = sorted(
+                    (cost, self.names[location_id], location_id)
+                    for location_id, cost in self.row(start).items()
+                    if location_id != start and location_id in self.names
+                )
+                self.sorted_rows[start] = ranked
+        return ranked
+
+
+_map = WorldMap()
+
+
+def travel_cost(start_id, end_id):
+    """Gold the cheapest way from start to end costs, None if no road leads there.
+
+    Heroes without a location yet can go anywhere for free."""
+    _map.sync()
+    if start_id is None:
+        return 0 if end_id in _map.names else None
+    if start_id == end_id:
+        return 0
+    cost = _map.row(start_id).get(end_id)
+    return None if cost is None or end_id not in _map.names else cost
+
+
+def reachable(start_id, limit=None):
+    """The cheapest destinations from start as (location_id, name, cost), cheapest first."""
+    _map.sync()
+    limit = limit or settings.TRAVEL_PANEL_SIZE
+    if start_id is None:
+        return [(location_id, name, 0) for location_id, name in sorted(_map.names.items())[:limit]]
+    return [(location_id, name, cost) for cost, name, location_id in _map.sorted_row(start_id)[:limit]]
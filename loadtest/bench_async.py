@@ -0,0 +1,74 @@
+"""Compare how many AI generations a server can keep in flight at once.
+
+Fires --concurrency simultaneous generate_new_enemy POSTs at every server
+given and reports how long the whole burst took. Run the stand-in AI service
+with a realistic delay so requests actually pile up, e.g.:
+
+    python -m loadtest.fake_ai --port 8001 --delay 2
+    export GAME_AI_MAX_CONCURRENT_CALLS=500 GAME_AI_MAX_QUEUED_CALLS=500
+    gunicorn core.wsgi -w 1 --threads 8 -b 127.0.0.1:8000
+    uvicorn core.asgi:application --port 8002
+    python -m loadtest.bench_async --concurrency 200 http://127.0.0.1:8000 http://127.0.0.1:8002
+
+Raise the admission caps (game/admission.py) above --concurrency like that
+on both servers. With the defaults (4 running, 16 queued) most of the burst
+is turned away with 503 and the numbers measure the gate, not sync vs async.
+"""
+import argparse
+import threading
+import time
+
+from loadtest.journeys import JourneyError, Player, Stats, percentile
+
+
+def burst(base_url, concurrency):
+    stats = Stats()
+    players = [Player(base_url, stats, think_time=0, max_attacks=0) for _ in range(concurrency)]
+
+    # Every client gets its own hero (and CSRF cookie) before the clock starts
+    char_ids = []
+    for index, player in enumerate(players):
+        player.request('setup', 'GET', '/game/create/')
+        listing = player.request('setup', 'POST', '/game/create/', {'name': f"Bench-{time.time_ns()}-{index}"})
+        char_ids.append(int(listing.text.rsplit('/game/character/', 1)[1].split('/', 1)[0]))
+
+    barrier = threading.Barrier(concurrency + 1)
+
+    def fire(player, char_id):
+        barrier.wait()
+        try:
+            player.request('generate_new_enemy', 'POST', f'/game/generate-enemy/{char_id}/')
+        except JourneyError:
+            pass
+
+    threads = [threading.Thread(target=fire, args=pair) for pair in zip(players, char_ids)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_urls', nargs='+')
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'server':<32}{'wall s':>8}{'gen/s':>8}{'p50 s':>8}{'p95 s':>8}{'max s':>8}{'errors':>8}")
+    for base_url in args.base_urls:
+        elapsed, stats = burst(base_url, args.concurrency)
+        latencies = stats.latencies['generate_new_enemy']
+        print(
+            f"{base_url:<32}{elapsed:>8.2f}{len(latencies) / elapsed:>8.1f}"
+            f"{percentile(latencies, 0.5):>8.2f}{percentile(latencies, 0.95):>8.2f}{max(latencies):>8.2f}"
+            f"{stats.errors['generate_new_enemy']:>8}"
+        )
+        if stats.errors['generate_new_enemy'] > args.concurrency // 10:
+            print("  many errors - were GAME_AI_MAX_CONCURRENT_CALLS/GAME_AI_MAX_QUEUED_CALLS raised on that server?")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Time to first token and total latency of the Ollama requests, before and after
+the prompt/keep-alive changes in ai_generator.py.
+
+"before" sends the old request shapes: request data at the start of the
+prompt, no keep_alive, no num_predict budget for enemies and shop items, no
+warm-up. "after" calls ai_generator.warm_up() once and then uses the payload
+builders from ai_generator.py. Both stream the answer so the first token can
+be timed.
+
+By default every mode gets a fresh loadtest.fake_ollama model, so the numbers
+only show what the request shapes cost under its cost model. Point
+--ollama-url at a real Ollama for real numbers:
+
+    python -m loadtest.bench_prompts --requests 40 --gap 1
+    python -m loadtest.bench_prompts --ollama-url http://localhost:11434/api/generate --gap 30
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+
+from loadtest.journeys import percentile
+
+CONTEXTS = ['Arena', 'Quest: Slay 3 Dire Wolves', 'Quest: Exterminate the Goblin Nest', 'a dark forest']
+
+
+def request_data():
+    return {
+        'player_level': random.randint(1, 50),
+        'player_health': random.randint(100, 600),
+        'player_strength': random.randint(20, 200),
+        'context': random.choice(CONTEXTS),
+        'quest_title': random.choice(CONTEXTS)[7:] or 'Monster Hunting',
+    }
+
+
+# ===== REQUEST SHAPES BEFORE =====
+def old_enemy(model, req):
+    health, power = req['player_health'], req['player_strength']
+    prompt = (
+        "You are a Game Master for an RPG. Create a new enemy. "
+        f"The context is: {req['context']}. "
+        f"Return ONLY a JSON object with this exact keys, no additional text : name, "
+        f"health({round(random.uniform(health * 1.5, health * 1.8), 2)}), level({req['player_level']}) "
+        f"attack_power({round(random.uniform(power * 0.4, power * 0.6), 2)}), "
+        f"xp_reward({round(random.uniform(power * 0.2, power * 0.4), 2)})"
+    )
+    return {"model": model, "prompt": prompt}
+
+
+def old_quests(model, req):
+    level = req['player_level']
+    prompt = (
+        f"You are a Quest Board for a fantasy RPG. Generate 3 unique COMBAT quests for a level {level} hero. "
+        "The theme MUST be killing monsters or clearing dangerous areas. "
+        "Each quest must have: 'title', 'description', and 'xp_reward'. "
+        "Example Titles: 'Slay 3 Dire Wolves', 'Exterminate the Goblin Nest', 'Hunt the Elder Slime'. "
+        f"XP rewards should be near {int((level ** 1.5) * 50)}. "
+        "Return ONLY a JSON list of objects. One sentence max for descriptions."
+    )
+    return {"model": model, "prompt": prompt, "format": "json", "options": {"temperature": 0.8, "num_predict": 400}}
+
+
+def old_shop_items(model, req):
+    prompt = (
+        f"Generate 3 unique RPG items for a Level {req['player_level']} character. "
+        "Each item must have a type from this list: [HEAD, CHEST, FEET, GLOVES, RING, AMULET, WEAPON]. "
+        "Return a JSON list with: 'name', 'item_type', 'health_bonus', 'power_bonus', 'price(10g)'."
+        "Return ONLY the JSON list."
+    )
+    return {"model": model, "prompt": prompt, "format": "json"}
+
+
+BEFORE = {
+    'generate_enemy': old_enemy,
+    'generate_quests': old_quests,
+    'generate_shop_items': old_shop_items,
+}
+
+
+# ===== MEASURING =====
+def timed_generate(url, payload):
+    """Stream one generation, return (time to first token, total time, final chunk)."""
+    payload = dict(payload, stream=True)
+    started = time.perf_counter()
+    first = None
+    final = {}
+    with requests.post(url, json=payload, stream=True, timeout=600) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if first is None:
+                first = time.perf_counter() - started
+            if chunk.get('done'):
+                final = chunk
+    return first, time.perf_counter() - started, final
+
+
+def run_mode(mode, url, count, gap):
+    import ai_generator
+
+    if mode == 'after':
+        ai_generator.OLLAMA_URL = url
+        ai_generator.warm_up()
+
+    results = {}
+    for index in range(count):
+        endpoint = list(BEFORE)[index % len(BEFORE)]
+        req = request_data()
+        if mode == 'before':
+            payload = BEFORE[endpoint](ai_generator.MODEL_NAME, req)
+        else:
+            payload = ai_generator.PAYLOADS[endpoint][1](req)
+
+        # Players don't arrive back to back
+        time.sleep(gap)
+        ttft, total, final = timed_generate(url, payload)
+        results.setdefault(endpoint, []).append((ttft, total, final.get('prompt_eval_count', 0), final.get('load_duration', 0)))
+    return results
+
+
+def report(mode, results):
+    print(f"\n{mode}")
+    print(f"{'endpoint':<22}{'n':>4}{'ttft p50':>10}{'ttft p95':>10}{'total p50':>11}{'total p95':>11}{'prompt tok':>12}{'cold':>6}")
+    for endpoint, rows in results.items():
+        ttfts = [row[0] for row in rows]
+        totals = [row[1] for row in rows]
+        prompt_tokens = sum(row[2] for row in rows) / len(rows)
+        cold = sum(1 for row in rows if row[3] > 0)
+        print(
+            f"{endpoint:<22}{len(rows):>4}{percentile(ttfts, 0.5):>10.3f}{percentile(ttfts, 0.95):>10.3f}"
+            f"{percentile(totals, 0.5):>11.3f}{percentile(totals, 0.95):>11.3f}{prompt_tokens:>12.1f}{cold:>6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ollama-url', help="real Ollama generate URL (default: a local fake_ollama)")
+    parser.add_argument('--requests', type=int, default=30, help="requests per mode")
+    parser.add_argument('--gap', type=float, default=1.0, help="idle seconds before every request")
+    parser.add_argument('--port', type=int, default=11499, help="port for the local fake_ollama")
+    args = parser.parse_args()
+
+    # ai_generator warms up on its own at startup - not here
+    os.environ['AI_WARM_UP'] = '0'
+
+    for mode in ('before', 'after'):
+        server = None
+        url = args.ollama_url
+        if url is None:
+            from loadtest import fake_ollama
+
+            server = fake_ollama.serve(args.port)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{args.port}/api/generate"
+        try:
+            report(mode, run_mode(mode, url, args.requests, args.gap))
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+
+if __name__ == '__main__':
+    main()
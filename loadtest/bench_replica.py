@@ -0,0 +1,108 @@
+"""Read throughput of the read-mostly views while other players fight.
+
+--writers players attack, rest and summon new enemies as fast as they can
+(every step writes to the database). At the same time --readers players click
+through characters_listing, quest_log, shop_page and select_enemy. The report
+shows how many reads per second got through and their latency.
+
+Run it against a server without and a server with the replica (both can
+share the primary, the runs happen one after the other):
+
+    python manage.py runserver --noreload 8000
+    GAME_REPLICA_DB=/tmp/replica.sqlite3 python manage.py sync_replica &
+    GAME_REPLICA_DB=/tmp/replica.sqlite3 python manage.py runserver --noreload 8001
+    python -m loadtest.bench_replica http://127.0.0.1:8000 http://127.0.0.1:8001
+"""
+import argparse
+import re
+import threading
+import time
+
+import requests
+
+from loadtest.journeys import JourneyError, Player, Stats, percentile
+
+READ_VIEWS = {
+    'characters_listing': '/game/characters_listing/',
+    'quest_log': '/game/quests/{char_id}/',
+    'shop_page': '/game/shop/{char_id}/',
+    'select_enemy': '/game/select_enemy/{char_id}/',
+}
+
+
+def create_hero(base_url, stats, name):
+    player = Player(base_url, stats, think_time=0, max_attacks=0)
+    player.request('setup', 'GET', '/game/create/')
+    listing = player.request('setup', 'POST', '/game/create/', {'name': name})
+    match = re.search(rf'<h2>{name}</h2>.*?/game/character/(\d+)/', listing.text, re.DOTALL)
+    if not match:
+        raise JourneyError("could not find the new hero")
+    return player, int(match.group(1))
+
+
+def write_loop(player, char_id, deadline):
+    while time.monotonic() < deadline:
+        try:
+            result = player.request('attack_enemy', 'POST', f'/game/attack_enemy/{char_id}/')
+            if '/battle/' in result.url and result.url.rstrip('/').endswith('/0'):
+                # Nobody left to fight - summon the next one (rate limited, so rest instead when refused)
+                player.request('generate_new_enemy', 'POST', f'/game/generate-enemy/{char_id}/')
+            player.request('rest', 'GET', f'/game/rest/{char_id}/')
+        except JourneyError:
+            time.sleep(0.05)
+
+
+def read_loop(base_url, stats, char_id, deadline):
+    # A fresh session: nothing written yet, so the replica may serve it
+    player = Player(base_url, stats, think_time=0, max_attacks=0)
+    player.session = requests.Session()
+    while time.monotonic() < deadline:
+        for step, path in READ_VIEWS.items():
+            try:
+                player.request(step, 'GET', path.format(char_id=char_id))
+            except JourneyError:
+                pass
+
+
+def run(base_url, readers, writers, seconds, settle):
+    stats = Stats()
+    tag = time.time_ns()
+    writer_heroes = [create_hero(base_url, stats, f"Writer-{tag}-{index}") for index in range(writers)]
+    reader_heroes = [create_hero(base_url, stats, f"Reader-{tag}-{index}")[1] for index in range(readers)]
+    # Give a replica time to receive the new heroes
+    time.sleep(settle)
+
+    deadline = time.monotonic() + seconds
+    threads = [threading.Thread(target=write_loop, args=(player, char_id, deadline)) for player, char_id in writer_heroes]
+    threads += [threading.Thread(target=read_loop, args=(base_url, stats, char_id, deadline)) for char_id in reader_heroes]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_urls', nargs='+')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--settle', type=float, default=3, help="seconds to wait between creating the heroes and the run")
+    args = parser.parse_args()
+
+    print(f"{'server':<26}{'reads/s':>9}{'read p50':>10}{'read p95':>10}{'errors':>8}{'writes/s':>10}")
+    for base_url in args.base_urls:
+        stats, elapsed = run(base_url, args.readers, args.writers, args.seconds, args.settle)
+        reads = [value for step in READ_VIEWS for value in stats.latencies[step]]
+        read_errors = sum(stats.errors[step] for step in READ_VIEWS)
+        writes = sum(len(stats.latencies[step]) for step in ('attack_enemy', 'rest', 'generate_new_enemy'))
+        print(
+            f"{base_url:<26}{len(reads) / elapsed:>9.1f}{percentile(reads, 0.5) * 1000:>9.1f}ms"
+            f"{percentile(reads, 0.95) * 1000:>8.1f}ms{read_errors:>8}{writes / elapsed:>10.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
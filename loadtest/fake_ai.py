@@ -0,0 +1,85 @@
+"""Fast local stand-in for the AI service (ai_generator.py).
+
+Answers the same endpoints with the same response shapes, but builds the
+content from game/procedural.py instead of asking Ollama. Use --delay to
+simulate a slow model.
+
+    python -m loadtest.fake_ai --port 8001 --delay 0.05
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from game import procedural
+
+
+def generate_enemy(req):
+    return procedural.enemy(
+        req.get('player_level', 1),
+        req.get('player_health', 100),
+        req.get('player_strength', 50),
+    )
+
+
+def ollama_envelope(records):
+    # The quest/shop endpoints pass Ollama's raw answer through
+    return {"response": json.dumps(records), "done": True}
+
+
+ROUTES = {
+    '/generate-enemy/': generate_enemy,
+    '/generate-quests/': lambda req: ollama_envelope(procedural.quests(req.get('player_level', 1))),
+    '/generate-quest-enemies/': lambda req: ollama_envelope([generate_enemy(req) for _ in range(3)]),
+    '/generate-shop-items/': lambda req: ollama_envelope(procedural.shop_items(req.get('player_level', 1))),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    delay = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        route = ROUTES.get(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        if route is None:
+            self.send_error(404)
+            return
+
+        if self.delay:
+            time.sleep(random.uniform(self.delay * 0.5, self.delay * 1.5))
+
+        body = json.dumps(route(request)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8001, delay=0.0):
+    Handler.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.0, help="average seconds per generation")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.delay)
+    print(f"Fake AI service on http://127.0.0.1:{args.port} (delay {args.delay}s)")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
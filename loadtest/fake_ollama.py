@@ -0,0 +1,173 @@
+"""Local stand-in for Ollama's /api/generate with a simple cost model.
+
+It doesn't run a model. It only charges time the way Ollama does:
+
+- loading the model when it isn't loaded (first call, or keep_alive ran out)
+- evaluating the prompt tokens that are not already in the KV cache - like
+  Ollama, there is one cache per parallel slot (OLLAMA_NUM_PARALLEL), each
+  holding the last prompt it ran, and a request reuses the longest prefix
+  it shares with any of them
+- generating tokens until the answer is done or num_predict is reached
+
+Time is compressed by --time-scale: with the default of 600, Ollama's
+default keep_alive of 5 minutes runs out after 0.5 seconds of idling.
+Supports "stream": true (NDJSON chunks), so time to first token can be
+measured.
+
+    python -m loadtest.fake_ollama --port 11434
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_KEEP_ALIVE = 300
+
+
+def tokens(text):
+    # Rough tokenizer: words and punctuation
+    return re.findall(r"\w+|[^\w\s]", text)
+
+
+def keep_alive_seconds(value):
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", str(value).strip())
+    if not match:
+        return DEFAULT_KEEP_ALIVE
+    number, unit = float(match.group(1)), match.group(2)
+    return number * {'': 1, 's': 1, 'm': 60, 'h': 3600}[unit]
+
+
+def common_prefix(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class Model:
+
+    def __init__(self, load_seconds, prompt_token_seconds, output_token_seconds, time_scale, slots=4):
+        self.lock = threading.Lock()
+        self.load_seconds = load_seconds
+        self.prompt_token_seconds = prompt_token_seconds
+        self.output_token_seconds = output_token_seconds
+        self.time_scale = time_scale
+        self.unload_at = 0.0
+        self.slots = [[] for _ in range(slots)]
+
+    def run(self, request):
+        """Yield (token, timings) pairs - timings is only set on the last one."""
+        # Keep it simple: one request at a time, like a single GPU mostly does
+        with self.lock:
+            started = time.monotonic()
+            load = 0.0
+            if started >= self.unload_at:
+                load = self.load_seconds
+                self.slots = [[] for _ in self.slots]
+                time.sleep(load)
+
+            prompt = tokens(request.get('prompt', ''))
+            reused, slot = max((common_prefix(cached, prompt), index) for index, cached in enumerate(self.slots))
+            if reused < len(self.slots[slot]):
+                # Partial match: Ollama copies the shared part into the least
+                # recently used slot instead of overwriting the better one
+                slot = 0
+            self.slots.pop(slot)
+            self.slots.append(prompt)
+            evaluated = len(prompt) - reused
+            time.sleep(evaluated * self.prompt_token_seconds)
+
+            # Left alone the model writes the JSON and then keeps explaining it
+            answer = random.randint(60, 140) + random.randint(0, 400)
+            limit = request.get('options', {}).get('num_predict', -1)
+            produced = answer if limit is None or limit < 0 else min(answer, limit)
+            for _ in range(produced):
+                time.sleep(self.output_token_seconds)
+                yield "tok ", None
+
+            keep_alive = keep_alive_seconds(request.get('keep_alive'))
+            # A negative keep_alive keeps the model loaded forever
+            self.unload_at = float('inf') if keep_alive < 0 else time.monotonic() + keep_alive / self.time_scale
+
+            ns = 1_000_000_000
+            yield "", {
+                'total_duration': int((time.monotonic() - started) * ns),
+                'load_duration': int(load * ns),
+                'prompt_eval_count': evaluated,
+                'prompt_eval_duration': int(evaluated * self.prompt_token_seconds * ns),
+                'eval_count': produced,
+                'eval_duration': int(produced * self.output_token_seconds * ns),
+            }
+
+
+class Handler(BaseHTTPRequestHandler):
+    model = None
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != '/api/generate':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        base = {'model': request.get('model', 'fake'), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+        if request.get('stream', True):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for token, timings in self.model.run(request):
+                chunk = dict(base, response=token, done=timings is not None, **(timings or {}))
+                line = json.dumps(chunk).encode() + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+            return
+
+        timings = {}
+        for _, timings in self.model.run(request):
+            pass
+        body = json.dumps(dict(base, response="{}", done=True, **timings)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=11434, load_seconds=1.5, prompt_token_seconds=0.002, output_token_seconds=0.004, time_scale=600):
+    Handler.model = Model(load_seconds, prompt_token_seconds, output_token_seconds, time_scale)
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--load', type=float, default=1.5, help="seconds to load the model")
+    parser.add_argument('--prompt-token', type=float, default=0.002, help="seconds per uncached prompt token")
+    parser.add_argument('--output-token', type=float, default=0.004, help="seconds per generated token")
+    parser.add_argument('--time-scale', type=float, default=600, help="how much faster keep_alive runs out")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.load, args.prompt_token, args.output_token, args.time_scale)
+    print(f"Fake Ollama on http://127.0.0.1:{args.port}/api/generate")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
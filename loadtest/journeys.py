@@ -0,0 +1,203 @@
+"""Simulate many concurrent players going through a full game journey.
+
+One journey is:
+    create_character -> quest_log -> assign_quest -> attack_enemy (until every
+    quest enemy is dead) -> complete_quest -> shop_page -> buy_item -> equip_item
+
+Start the stand-in AI service and the app first, for example:
+
+    python -m loadtest.fake_ai --port 8001
+    AI_SERVICE_URL=http://127.0.0.1:8001 python manage.py runserver --noreload 8000
+    python -m loadtest.journeys --base-url http://127.0.0.1:8000 --players 20 --think-time 0.2
+"""
+import argparse
+from collections import defaultdict
+import random
+import re
+import threading
+import time
+import uuid
+
+import requests
+
+
+class Stats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.journeys = 0
+        self.failed_journeys = 0
+
+    def record(self, step, seconds, ok):
+        with self.lock:
+            self.latencies[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+
+    def finish_journey(self, ok):
+        with self.lock:
+            if ok:
+                self.journeys += 1
+            else:
+                self.failed_journeys += 1
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(len(ordered) * fraction), len(ordered) - 1)
+    return ordered[index]
+
+
+class JourneyError(Exception):
+    pass
+
+
+class Player:
+
+    def __init__(self, base_url, stats, think_time, max_attacks):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.think_time = think_time
+        self.max_attacks = max_attacks
+        self.session = requests.Session()
+
+    def think(self):
+        if self.think_time:
+            time.sleep(random.uniform(self.think_time * 0.5, self.think_time * 1.5))
+
+    def request(self, step, method, path, data=None):
+        self.think()
+        headers = {}
+        if method == 'POST':
+            data = dict(data or {}, csrfmiddlewaretoken=self.session.cookies.get('csrftoken', ''))
+            headers['Referer'] = self.base_url + path
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, data=data, headers=headers, timeout=300)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.stats.record(step, time.perf_counter() - start, ok)
+
+        if not ok:
+            raise JourneyError(f"{step} failed ({response.status_code if response is not None else 'no response'})")
+        return response
+
+    def claim_quest(self, char_id, board, attempts=3):
+        """Assign a quest from the board, (quest id, enemy ids).
+
+        The board is shared by the band, so another player may claim the quest
+        first - assign_quest then sends us back to the board to pick again."""
+        for _ in range(attempts):
+            quest_ids = re.findall(rf'/game/assign-quest/{char_id}/(\d+)', board.text)
+            if not quest_ids:
+                raise JourneyError("quest board is empty")
+            quest_id = int(random.choice(quest_ids))
+
+            detail = self.request('assign_quest', 'POST', f'/game/assign-quest/{char_id}/{quest_id}')
+            if f'/game/quest-detail/{char_id}/{quest_id}/' not in detail.url:
+                # "That quest has already been taken" - the answer is the board again
+                board = detail
+                continue
+            enemy_ids = list(dict.fromkeys(re.findall(rf'/game/battle/{char_id}/(\d+)/', detail.text)))
+            if not enemy_ids:
+                raise JourneyError(f"quest {quest_id} came without enemies")
+            return quest_id, enemy_ids
+        raise JourneyError(f"lost the race for {attempts} quests in a row")
+
+    def run(self):
+        name = f"Loadtest-{uuid.uuid4().hex[:10]}"
+        self.request('create_character', 'GET', '/game/create/')
+        listing = self.request('create_character', 'POST', '/game/create/', {'name': name})
+        match = re.search(rf'<h2>{name}</h2>.*?/game/character/(\d+)/', listing.text, re.DOTALL)
+        if not match:
+            raise JourneyError("could not find the new hero")
+        char_id = int(match.group(1))
+
+        board = self.request('quest_log', 'GET', f'/game/quests/{char_id}/')
+        quest_id, enemy_ids = self.claim_quest(char_id, board)
+
+        for enemy_id in enemy_ids:
+            self.request('battle_arena', 'GET', f'/game/battle/{char_id}/{enemy_id}/')
+            for _ in range(self.max_attacks):
+                result = self.request('attack_enemy', 'POST', f'/game/attack_enemy/{char_id}/')
+                if f'/game/quest-detail/{char_id}/' in result.url:
+                    break
+                if f'/game/character/{char_id}/' in result.url:
+                    # Defeated - rest up and get back in there
+                    self.request('rest', 'GET', f'/game/rest/{char_id}/')
+                    self.request('battle_arena', 'GET', f'/game/battle/{char_id}/{enemy_id}/')
+
+        done = self.request('complete_quest', 'POST', f'/game/complete-quest/{char_id}/{quest_id}/')
+        # Success lands on the quest log, unfinished business on the quest page
+        if not done.url.endswith(f'/game/quests/{char_id}/'):
+            raise JourneyError(f"quest {quest_id} was not completed")
+
+        shop = self.request('shop_page', 'GET', f'/game/shop/{char_id}/')
+        item_ids = re.findall(rf'/game/buy-item/{char_id}/(\d+)', shop.text)
+        if item_ids:
+            self.request('buy_item', 'POST', f'/game/buy-item/{char_id}/{random.choice(item_ids)}')
+
+        profile = self.request('character_detail', 'GET', f'/game/character/{char_id}/')
+        bag = re.findall(rf'/game/equip-item/{char_id}/(\d+)/', profile.text)
+        if bag:
+            self.request('equip_item', 'POST', f'/game/equip-item/{char_id}/{bag[0]}/')
+
+
+def player_loop(args, stats, deadline):
+    while time.monotonic() < deadline:
+        player = Player(args.base_url, stats, args.think_time, args.max_attacks)
+        try:
+            player.run()
+            stats.finish_journey(True)
+        except JourneyError:
+            stats.finish_journey(False)
+        if args.once:
+            return
+
+
+def report(stats, elapsed):
+    total_requests = sum(len(values) for values in stats.latencies.values())
+    total_errors = sum(stats.errors.values())
+
+    print(f"\n{'step':<18}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, values in sorted(stats.latencies.items()):
+        print(
+            f"{step:<18}{len(values):>8}{stats.errors[step]:>8}"
+            f"{percentile(values, 0.50) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}"
+            f"{percentile(values, 0.99) * 1000:>10.1f}{max(values) * 1000:>10.1f}"
+        )
+
+    print(f"\nDuration:         {elapsed:.1f}s")
+    print(f"Requests:         {total_requests} ({total_requests / elapsed:.1f} req/s)")
+    print(f"Error rate:       {total_errors / max(total_requests, 1):.2%}")
+    print(f"Journeys:         {stats.journeys} completed, {stats.failed_journeys} failed ({stats.journeys / elapsed * 60:.1f}/min)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--players', type=int, default=10, help="concurrent players")
+    parser.add_argument('--duration', type=float, default=60, help="seconds to keep starting new journeys")
+    parser.add_argument('--once', action='store_true', help="every player runs a single journey, then stops")
+    parser.add_argument('--think-time', type=float, default=0.5, help="average seconds between a player's clicks")
+    parser.add_argument('--max-attacks', type=int, default=30, help="give up on an enemy after this many attacks")
+    args = parser.parse_args()
+
+    stats = Stats()
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=player_loop, args=(args, stats, deadline)) for _ in range(args.players)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report(stats, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()